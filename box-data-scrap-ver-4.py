@@ -5,6 +5,7 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 import threading
+import queue
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 from bs4 import BeautifulSoup
@@ -15,6 +16,7 @@ import os
 from datetime import datetime
 import json
 import logging
+from openpyxl import load_workbook
 
 def handle_cookie_popup(driver):
     try:
@@ -58,24 +60,34 @@ def get_chrome_options():
 
 # Thread function
 def scrape_product_thread(link):
-    with semaphore:  # Limit active threads
-        product_data = scrape_with_retries(link)
-        if product_data:
-            with lock:
-                scraped_data.append(product_data)
-        else:
-            with lock:
-                failed_links.append(link)
+    product_data = scrape_with_retries(link)
+    if product_data:
+        with lock:
+            scraped_data.append(product_data)
+    else:
+        with lock:
+            failed_links.append(link)
 
 
 # Thread-safe list lock
 lock = threading.Lock()
-MAX_THREADS = 5  # You can increase or decrease this based on your system capacity
-semaphore = threading.Semaphore(MAX_THREADS)
+MAX_THREADS = 5  # Number of worker threads, increase or decrease based on your system capacity
 
-# Read the Excel file containing product page links
+# Excel file containing product page links, read row by row while the workers scrape
 file_path = 'Box_Links.xlsx'  # Update the file path if needed
-df = pd.read_excel(file_path)
+
+def iter_excel_links(file_path, column_name='Links'):
+    # Read-only mode streams the rows from the file instead of loading the whole workbook
+    workbook = load_workbook(file_path, read_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        column = header.index(column_name) if column_name in header else 0
+        for row in rows:
+            if column < len(row) and isinstance(row[column], str) and row[column].strip():
+                yield row[column].strip()
+    finally:
+        workbook.close()
 
 def scrape_with_retries(product_link):
     for attempt in range(1, MAX_RETRIES + 1):
@@ -396,15 +408,38 @@ scraped_data = []
 failed_links = []
 
 
-# Launch threads
-threads = []
-for link in df['Links']:
-    thread = threading.Thread(target=scrape_product_thread, args=(link,))
-    thread.start()
-    threads.append(thread)
+# Bounded work queue: the link reader blocks once LINK_QUEUE_SIZE links are waiting,
+# so only MAX_THREADS worker threads exist however long the link file is
+LINK_QUEUE_SIZE = MAX_THREADS * 2
+link_queue = queue.Queue(maxsize=LINK_QUEUE_SIZE)
+
+def link_worker():
+    while True:
+        link = link_queue.get()
+        try:
+            if link is None:  # Sentinel: no more links
+                return
+            scrape_product_thread(link)
+        except Exception as e:
+            logger.error(f"❌ Unexpected error in worker for {link}: {e}")
+            logger.error(traceback.format_exc())
+        finally:
+            link_queue.task_done()
+
+def run_link_queue(links, worker_count=MAX_THREADS):
+    workers = [threading.Thread(target=link_worker, daemon=True) for _ in range(worker_count)]
+    for worker in workers:
+        worker.start()
+
+    for link in links:
+        link_queue.put(link)  # Blocks while the queue is full (backpressure on the reader)
+
+    for _ in workers:
+        link_queue.put(None)
+    for worker in workers:
+        worker.join()
 
-for t in threads:
-    t.join()
+run_link_queue(iter_excel_links(file_path))
     # Save failed links if any
 if failed_links:
     failed_df = pd.DataFrame({'Failed_Links': failed_links})
@@ -1,30 +1,52 @@
 # Good working for only product link 
 
-import pandas as pd 
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 import threading
+import queue
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.keys import Keys
 from webdriver_manager.chrome import ChromeDriverManager
 from bs4 import BeautifulSoup
+from lxml import html as lxml_html
+from lxml import etree
 import traceback
+import shutil
 import time
 import requests
+import random
+import re
 import os
 from datetime import datetime
 import json
 import logging
+import argparse
+import hashlib
+import glob
+import multiprocessing
+import sqlite3
+import csv
+import gzip
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from openpyxl import Workbook, load_workbook
+from concurrent.futures import ProcessPoolExecutor
+try:
+    from PIL import Image
+except ImportError:
+    Image = None  # Pillow is only needed for --renditions
+try:
+    import psutil
+except ImportError:
+    psutil = None  # Memory and CPU are read from /proc and the load average instead
 
 def handle_cookie_popup(driver):
     try:
-        WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.XPATH, '//*[@id="onetrust-accept-btn-handler"]'))
-        ).click()
+        wait_until(driver, EC.element_to_be_clickable((By.XPATH, '//*[@id="onetrust-accept-btn-handler"]')), 10).click()
         print("✅ Cookie popup accepted.")
     except Exception as e:
         print("⚠️ No cookie popup or already accepted.")
@@ -47,10 +69,92 @@ def handle_newsletter_popup(driver):
         """
         result = driver.execute_script(script)
         print(result)
-        time.sleep(2)
+        if result.startswith("✅"):
+            # Wait until the close button is gone instead of sleeping a fixed time
+            try:
+                wait_until(driver, lambda d: d.execute_script(NEWSLETTER_CLOSED_SCRIPT))
+            except Exception:
+                logger.warning("⚠️ Newsletter popup still visible after closing it")
     except Exception as e:
         print(f"❌ Exception while handling newsletter popup: {e}")
 
+# Consent state seeded into every Chrome session once, so the OneTrust banner and the newsletter
+# popup do not block pages. CONSENT_COOKIES and NEWSLETTER_STORAGE are what the site stores after
+# "Accept" and after closing the newsletter form.
+CONSENT_URL = "https://www.box.co.uk/"
+CONSENT_DOMAIN = ".box.co.uk"
+CONSENT_COOKIES = {
+    "OptanonAlertBoxClosed": "{now}",
+    "OptanonConsent": "isGpcEnabled=0&datestamp={now}&version=6.0.0&interactionCount=1&landingPath=NotLandingPage"
+                      "&groups=C0001%3A1%2CC0002%3A1%2CC0003%3A1%2CC0004%3A1&AwaitingReconsent=false",
+}
+NEWSLETTER_POPUP_SELECTOR = "#mcforms-92356-113983"
+NEWSLETTER_STORAGE = {"mcforms-92356-113983-closed": "true"}
+
+# Runs before the site's own scripts on every page: stores the "newsletter closed" keys and removes
+# the newsletter form should it still be injected
+CONSENT_INIT_SCRIPT = """
+(() => {
+    if (!location.hostname.endsWith("box.co.uk")) return;
+    try {
+        for (const [key, value] of Object.entries(%s)) localStorage.setItem(key, value);
+    } catch (e) {}
+    const removePopup = () => {
+        const popup = document.querySelector("%s");
+        if (popup) popup.remove();
+    };
+    new MutationObserver(removePopup).observe(document, {childList: true, subtree: true});
+})();
+""" % (json.dumps(NEWSLETTER_STORAGE), NEWSLETTER_POPUP_SELECTOR)
+
+# Fast check (one WebDriver call) whether any popup is actually showing
+POPUPS_VISIBLE_SCRIPT = """
+const accept = document.querySelector("#onetrust-accept-btn-handler");
+const popup = document.querySelector("%s");
+return {
+    cookie: !!accept && accept.getClientRects().length > 0,
+    newsletter: !!popup && !!popup.shadowRoot && !!popup.shadowRoot.querySelector("#el_bYfcVA1AUwL"),
+};
+""" % NEWSLETTER_POPUP_SELECTOR
+
+def seed_consent_cookies(driver):
+    now = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.000Z')
+    expires = time.time() + 365 * 24 * 3600
+    for name, value in CONSENT_COOKIES.items():
+        driver.execute_cdp_cmd("Network.setCookie", {
+            "name": name,
+            "value": value.replace("{now}", now),
+            "url": CONSENT_URL,
+            "domain": CONSENT_DOMAIN,
+            "path": "/",
+            "expires": expires,
+        })
+
+def seed_consent_state(driver):
+    """
+    Pre-loads the cookie consent and the newsletter-dismissed state into a new Chrome session.
+    Done once per session, the cookies are set again after each reset_driver_session.
+    """
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": CONSENT_INIT_SCRIPT})
+        seed_consent_cookies(driver)
+        logger.info("🍪 Consent state seeded")
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to seed consent state: {e}")
+
+def handle_popups(driver):
+    # Only run the (slow) popup handlers when the fast check finds one on screen
+    try:
+        visible = driver.execute_script(POPUPS_VISIBLE_SCRIPT)
+    except Exception as e:
+        logger.warning(f"⚠️ Popup check failed: {e}")
+        visible = {"cookie": True, "newsletter": True}
+
+    if visible.get("cookie"):
+        handle_cookie_popup(driver)
+    if visible.get("newsletter"):
+        handle_newsletter_popup(driver)
+
 
 # Logging setup
 log_file = f"scraping_log_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log"
@@ -62,8 +166,165 @@ logging.basicConfig(
 logger = logging.getLogger()
 
 MAX_RETRIES = 2
-
-def get_chrome_options():
+PRODUCT_CHECK_TIMEOUT = 20  # Seconds to wait for the "Product Overview" check after navigation
+INVALID_PAGE = "INVALID_PAGE"  # Returned by scrape_product_page for non-product pages
+WAIT_TIMEOUT = 10  # Upper bound in seconds for the condition based waits (override with --wait-timeout)
+ELEMENT_TIMEOUT = 30  # Seconds to wait for the required product elements
+OPTIONAL_ELEMENT_TIMEOUT = 2  # Extra seconds optional elements may take once the required ones are there
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# Extraction engine: "auto" tries plain HTTP first and launches Chrome only when a required
+# field is missing, "http" never launches Chrome, "browser" always uses Chrome (override with --engine)
+ENGINE = "auto"
+HTTP_TIMEOUT = 20
+HTTP_REQUIRED_FIELDS = ['Product Name', 'Product MPN', 'Product Current Price', 'Specifications']
+
+# Chrome extraction mode: "snapshot" expands the accordions with one script and parses every field
+# from a single page_source, "webdriver" reads each field element by element (override with --extraction)
+EXTRACTION_MODE = "snapshot"
+
+# Optional extraction stages and the fields they fill. Name, MPN and prices are always collected; a stage
+# that is not requested (--fields) never runs its waits, scrolls or clicks and its fields are NOT_COLLECTED.
+STAGE_FIELDS = {
+    "breadcrumbs": ['Sub Category', 'Child Category', 'Grand Child Categories'],
+    "images": ['Thumbnail_Image', 'Additional_Image_1', 'Additional_Image_2', 'Additional_Image_3'],
+    "tags": ['Tags'],
+    "key_features": ['Key_Features'],
+    "specifications": ['Specifications'],
+    "faqs": ['FAQs'],
+}
+ALL_STAGES = frozenset(STAGE_FIELDS)
+RECORD_FIELDS = ["Link", 'Product Name', 'Product MPN', 'Product Current Price', 'Product List Price'] \
+    + [field for fields in STAGE_FIELDS.values() for field in fields]
+STAGES = ALL_STAGES
+LAZY_STAGES = {"images", "specifications", "faqs"}  # Content that only loads after scrolling down
+NOT_COLLECTED = "NOT_COLLECTED"
+
+def parse_stages(value):
+    # "specifications,faqs" -> frozenset of stages, "all" for every stage, "none" for the core fields only
+    value = value.strip().lower()
+    if value == "all":
+        return ALL_STAGES
+    if value == "none":
+        return frozenset()
+    stages = frozenset(stage.strip() for stage in value.split(",") if stage.strip())
+    unknown = stages - ALL_STAGES
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown field group(s) {sorted(unknown)}, choose from {sorted(ALL_STAGES)}")
+    return stages
+
+def mark_not_collected(record, stages):
+    for stage, fields in STAGE_FIELDS.items():
+        if stage not in stages:
+            for field in fields:
+                record[field] = NOT_COLLECTED
+    return record
+
+# Stage outcomes: every requested stage reports ok, empty, timeout or error in the record's Stage_Status.
+# Stages that time out or fail are rerun on the page that is still open (STAGE_ATTEMPTS in total) while
+# the stages that worked are kept; only a stage that still fails gets its old placeholder value.
+STAGE_STATUS_FIELD = "Stage_Status"
+STAGE_ATTEMPTS = 2
+STAGE_FALLBACKS = {
+    "breadcrumbs": {'Sub Category': None, 'Child Category': None, 'Grand Child Categories': []},
+    "images": {'Thumbnail_Image': None, 'Additional_Image_1': None, 'Additional_Image_2': None, 'Additional_Image_3': None},
+    "tags": {'Tags': json.dumps({"Tags": "Error retrieving tags"})},
+    "key_features": {'Key_Features': json.dumps({"Key_Feature": ["Error retrieving features"]}, indent=4)},
+    "specifications": {'Specifications': json.dumps({"Specs": "Error retrieving specifications"}, indent=4)},
+    "faqs": {'FAQs': {"FAQs": [{"Question": "N/A", "Answer": "FAQ section not found"}]}},
+}
+
+def load_json_field(value):
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+    return value
+
+def is_stage_empty(stage, record):
+    # True when the stage ran but found nothing (or only its "N/A" placeholder) in the record
+    if stage == "breadcrumbs":
+        return not record.get('Sub Category')
+    if stage == "images":
+        return not record.get('Thumbnail_Image')
+    if stage == "tags":
+        tags = (load_json_field(record.get('Tags')) or {}).get("Tags")
+        return not isinstance(tags, list) or tags in ([], ["N/A"])
+    if stage == "key_features":
+        features = (load_json_field(record.get('Key_Features')) or {}).get("Key_Feature")
+        return not features or features == ["N/A"]
+    if stage == "specifications":
+        specs = (load_json_field(record.get('Specifications')) or {}).get("Specs")
+        return not isinstance(specs, list) or not specs
+    if stage == "faqs":
+        faqs = (record.get('FAQs') or {}).get("FAQs") or []
+        return all(faq.get("Question") == "N/A" for faq in faqs)
+    return False
+
+def get_stage_statuses(record, stages):
+    return {stage: "empty" if is_stage_empty(stage, record) else "ok" for stage in STAGE_FIELDS if stage in stages}
+
+def run_stages(record, stage_functions):
+    """
+    Runs each stage function (returning the stage's fields) on the open page and stores the
+    fields in the record. Stages that time out or raise are retried up to STAGE_ATTEMPTS times
+    without touching the others, then get their STAGE_FALLBACKS value. Returns the outcomes.
+    """
+    statuses = {}
+    pending = list(stage_functions)
+    for attempt in range(1, STAGE_ATTEMPTS + 1):
+        failed = []
+        for stage in pending:
+            try:
+                record.update(stage_functions[stage]())
+                statuses[stage] = "empty" if is_stage_empty(stage, record) else "ok"
+            except TimeoutException as e:
+                statuses[stage] = "timeout"
+                failed.append(stage)
+                logger.warning(f"⏱️ Stage {stage} timed out (attempt {attempt}): {e}")
+            except Exception as e:
+                statuses[stage] = "error"
+                failed.append(stage)
+                logger.error(f"❌ Stage {stage} failed (attempt {attempt}): {e}")
+        pending = failed
+        if not pending:
+            break
+    for stage in pending:
+        record.update(STAGE_FALLBACKS[stage])
+    return statuses
+
+# Product page XPaths, shared by the Chrome and the HTTP extraction paths
+PRODUCT_NAME_XPATH = '//*[@id="maincontent"]/app-dynamic-page/app-pdp/section/div/div[1]/div[2]/div[1]/h1'
+PRODUCT_MPN_XPATH = '//*[@id="maincontent"]/app-dynamic-page/app-pdp/section/div/div[1]/div[2]/div[1]/div[1]/span'
+PRODUCT_PRICE_XPATH = '//*[@id="maincontent"]/app-dynamic-page/app-pdp/section[1]/div/div[1]/div[2]/div[1]/div[3]/div/div[1]/div[1]/span'
+PRODUCT_LIST_PRICE_XPATH = '//*[@id="maincontent"]/app-dynamic-page/app-pdp/section[1]/div/div[1]/div[2]/div[1]/div[3]/div/div[2]/span'
+BREADCRUMB_XPATH = '//*[@id="maincontent"]/app-dynamic-page/app-pdp/section/app-breadcrumbs/div/div/div/div'
+BREADCRUMB_LINKS_XPATH = '//*[@id="maincontent"]/app-dynamic-page/app-pdp/section[1]/app-breadcrumbs/div/div/div/div/a'
+IMAGE_BASE_XPATH = '//*[@id="maincontent"]/app-dynamic-page/app-pdp/section[1]/div/div[1]/div[1]/div/app-custom-pdp-swiper/div[2]/div[2]/div/div[2]/div'
+TAGS_XPATH = '//*[@id="maincontent"]/app-dynamic-page/app-pdp/section[1]/div/div[1]/div[2]/div[1]/div[2]'
+KEY_FEATURES_XPATH = '//*[@id="maincontent"]/app-dynamic-page/app-pdp/section/div/div[1]/div[2]/div[3]/div[2]'
+SPEC_MAIN_HEADER_XPATH = '//*[@id="index-1_header_action"]/span[2]'
+SPEC_MAIN_DIV_XPATH = '//*[@id="index-1_content"]/div/div'
+
+# Resource blocking (override with --block): "blocklist" blocks BLOCKED_URL_PATTERNS through Chrome
+# DevTools, "allowlist" lets Chrome resolve ALLOWED_HOSTS only, "off" loads everything.
+# Scripts and XHR from the site itself stay allowed so the Angular app keeps working.
+BLOCK_MODE = "blocklist"
+BLOCKED_URL_PATTERNS = [
+    # Fonts, video and images (image URLs are still read from the DOM and downloaded separately)
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.m3u8", "*youtube.com*", "*vimeo.com*",
+    "*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.avif", "*.svg",
+    # Analytics, advertising and tracking
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*googleadservices.com*",
+    "*facebook.net*", "*facebook.com/tr*", "*hotjar.com*", "*clarity.ms*", "*bing.com*", "*tiktok.com*",
+    "*criteo.*", "*trustpilot.com*", "*cookielaw.org*", "*onetrust.com*",
+]
+ALLOWED_HOSTS = ["box.co.uk", "*.box.co.uk"]
+BLOCK_BASELINE_PAGES = 3  # First pages loaded without blocking, to report what blocking saves
+
+def get_chrome_options(proxy=None):
     options = Options()
     options.add_argument("--headless=chrome")  # ✅ Stable headless mode
     options.add_argument("--window-size=1920,1080")
@@ -72,10 +333,617 @@ def get_chrome_options():
     options.add_argument("--disable-extensions")
     options.add_argument("--disable-dev-shm-usage")
     options.add_argument("--log-level=3")
-    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+    options.add_argument(f"user-agent={USER_AGENT}")
+    if BLOCK_MODE == "allowlist":
+        # Every other host fails DNS resolution, so third-party requests never leave the browser
+        # (not combined with a proxy, see configure_run)
+        excluded = ", ".join(f"EXCLUDE {host}" for host in ALLOWED_HOSTS)
+        options.add_argument(f"--host-resolver-rules=MAP * ~NOTFOUND , {excluded}")
+    if MODE == "full":
+        # CDP network events for the per page resource report (record_page_resources)
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    if proxy:
+        # Chrome takes no credentials here, load_proxies only allows them with --engine http
+        parts = urlsplit(proxy)
+        options.add_argument(f"--proxy-server={parts.scheme}://{parts.netloc.rpartition('@')[2]}")
     return options
 
 
+# Proxy pool (--proxies): every Chrome session stays on the proxy it was started with, HTTP requests and
+# image downloads pick a proxy per request. Each proxy keeps a success rate and latency (moving averages)
+# and its block signals; the health score weights the choice, and a proxy that is blocked, keeps failing
+# or falls below PROXY_MIN_SUCCESS is taken out for a cool-down (doubling each time) and then brought
+# back on probation.
+PROXIES = []
+PROXY_EWMA_WEIGHT = 0.2  # Weight of the newest result in the moving averages
+PROXY_MIN_SAMPLES = 5
+PROXY_MIN_SUCCESS = 0.5
+PROXY_MAX_CONSECUTIVE_FAILURES = 3
+PROXY_SLOW_SECONDS = 10.0  # Latency at which a proxy loses half of its score
+PROXY_COOLDOWN = 300  # Seconds out of the pool after the first ejection
+PROXY_MAX_COOLDOWN = 3600
+PROXY_DEFAULT_PORTS = {"http": 80, "https": 443, "socks4": 1080, "socks5": 1080}
+proxy_lock = threading.Lock()
+proxy_stats = {}
+
+def load_proxies(value, allow_credentials=False):
+    """
+    Reads "http://host:port,host2:port" or a file with one proxy URL per line. A missing scheme
+    means http and a missing port the scheme's default, so Chrome and requests use the same
+    address. Proxies with credentials are rejected unless allow_credentials (--engine http),
+    Chrome cannot send them.
+    """
+    if os.path.isfile(value):
+        with open(value, encoding="utf-8") as f:
+            entries = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    else:
+        entries = [entry.strip() for entry in value.split(",") if entry.strip()]
+
+    proxies = []
+    for entry in entries:
+        parts = urlsplit(entry if "://" in entry else f"http://{entry}")
+        scheme = parts.scheme.lower()
+        userinfo, _, address = parts.netloc.rpartition("@")
+        try:
+            port = parts.port or PROXY_DEFAULT_PORTS.get(scheme)
+        except ValueError:
+            port = None
+        if scheme not in PROXY_DEFAULT_PORTS or not parts.hostname or not port:
+            raise SystemExit(f"Invalid proxy '{scheme}://{address}', expected e.g. http://host:port "
+                             f"(schemes: {', '.join(PROXY_DEFAULT_PORTS)})")
+        host = address if parts.port else f"{address}:{port}"
+        if userinfo and not allow_credentials:
+            raise SystemExit(f"Proxy {scheme}://{host} has credentials, which Chrome cannot use: "
+                             "use IP allowlisted proxies, or --engine http")
+        proxies.append(f"{scheme}://{userinfo + '@' if userinfo else ''}{host}")
+    return proxies
+
+def get_proxy_state(proxy):
+    state = proxy_stats.get(proxy)
+    if state is None:
+        state = proxy_stats[proxy] = {"success": 1.0, "latency": 0.0, "samples": 0, "requests": 0, "failures": 0,
+                                      "blocks": 0, "consecutive_failures": 0, "ejections": 0, "cooldown_until": 0.0}
+    return state
+
+def get_proxy_score(state):
+    return state["success"] / (1 + state["latency"] / PROXY_SLOW_SECONDS)
+
+def choose_proxy():
+    """
+    Picks a healthy proxy, weighted by health score. When every proxy is cooling down the one
+    that comes back first is used. Returns None without --proxies.
+    """
+    if not PROXIES:
+        return None
+    now = time.time()
+    with proxy_lock:
+        states = {proxy: get_proxy_state(proxy) for proxy in PROXIES}
+        for proxy, state in states.items():
+            if state["cooldown_until"] and now >= state["cooldown_until"]:
+                # Back on probation: the old averages no longer say much about the proxy
+                state.update({"success": 0.75, "latency": 0.0, "samples": 0, "consecutive_failures": 0,
+                              "cooldown_until": 0.0})
+                logger.info(f"🔌 Proxy {proxy} back in the pool after its cool-down")
+        healthy = [proxy for proxy, state in states.items() if not state["cooldown_until"]]
+        if not healthy:
+            return min(states, key=lambda proxy: states[proxy]["cooldown_until"])
+        weights = [max(get_proxy_score(states[proxy]), 0.01) for proxy in healthy]
+    return random.choices(healthy, weights=weights)[0]
+
+def eject_proxy(proxy, state, reason):
+    # Called with proxy_lock held
+    cooldown = min(PROXY_MAX_COOLDOWN, PROXY_COOLDOWN * 2 ** state["ejections"])
+    state["ejections"] += 1
+    state["cooldown_until"] = time.time() + cooldown
+    logger.warning(f"🔌 Proxy {proxy} out of the pool for {cooldown}s: {reason}")
+
+def record_proxy_result(proxy, ok, seconds=None, blocked=False):
+    if not proxy:
+        return
+    with proxy_lock:
+        state = get_proxy_state(proxy)
+        state["requests"] += 1
+        state["samples"] += 1
+        state["success"] += PROXY_EWMA_WEIGHT * ((1.0 if ok else 0.0) - state["success"])
+        if seconds is not None:
+            state["latency"] += PROXY_EWMA_WEIGHT * (seconds - state["latency"]) if state["latency"] else seconds
+        if ok:
+            state["consecutive_failures"] = 0
+            return
+        state["failures"] += 1
+        state["consecutive_failures"] += 1
+        if blocked:
+            state["blocks"] += 1
+        if state["cooldown_until"]:
+            return  # Already out of the pool
+        if blocked:
+            eject_proxy(proxy, state, "block signal")
+        elif state["consecutive_failures"] >= PROXY_MAX_CONSECUTIVE_FAILURES:
+            eject_proxy(proxy, state, f"{state['consecutive_failures']} failures in a row")
+        elif state["samples"] >= PROXY_MIN_SAMPLES and state["success"] < PROXY_MIN_SUCCESS:
+            eject_proxy(proxy, state, f"success rate {state['success']:.0%}")
+
+def is_proxy_cooling_down(proxy):
+    with proxy_lock:
+        return bool(proxy and get_proxy_state(proxy)["cooldown_until"])
+
+def log_proxy_summary():
+    if not PROXIES:
+        return
+    with proxy_lock:
+        states = {proxy: dict(get_proxy_state(proxy)) for proxy in PROXIES}
+    for proxy, state in states.items():
+        summary = (f"🔌 {proxy}: {state['requests']} request(s), {state['failures']} failed, {state['blocks']} blocked, "
+                   f"score {get_proxy_score(state):.2f}, latency {state['latency']:.1f}s, ejected {state['ejections']}x")
+        logger.info(summary)
+        print(summary)
+
+
+# Per page resource report: bytes transferred and load time, compared to the unblocked baseline pages
+resource_lock = threading.Lock()
+resource_stats = {
+    "baseline": {"pages": 0, "bytes": 0, "load_ms": 0.0},
+    "blocked": {"pages": 0, "bytes": 0, "load_ms": 0.0},
+}
+baseline_pages_started = 0
+
+PAGE_LOAD_SCRIPT = """
+const nav = performance.getEntriesByType("navigation")[0];
+return nav ? nav.loadEventEnd - nav.startTime : 0;
+"""
+
+def read_transferred_bytes(driver):
+    """
+    Drains the session's performance log (CDP network events) and returns the bytes received by
+    the requests that finished since the last call: the encodedDataLength of Network.loadingFinished.
+    Unlike the Resource Timing API, this includes cross-origin responses without Timing-Allow-Origin.
+    """
+    total = 0
+    for entry in driver.get_log("performance"):
+        message = json.loads(entry["message"])["message"]
+        if message.get("method") == "Network.loadingFinished":
+            total += message["params"].get("encodedDataLength", 0)
+    return total
+
+def start_page_resources(driver):
+    # Empties the performance log, so the next record_page_resources only counts the new page
+    try:
+        read_transferred_bytes(driver)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not read the performance log: {e}")
+
+def use_blocking_for_next_page():
+    # The first BLOCK_BASELINE_PAGES pages of a blocklist run load everything to measure the baseline
+    global baseline_pages_started
+    if BLOCK_MODE != "blocklist":
+        return BLOCK_MODE == "allowlist"
+    with resource_lock:
+        if baseline_pages_started < BLOCK_BASELINE_PAGES:
+            baseline_pages_started += 1
+            return False
+    return True
+
+def apply_resource_blocking(driver, enabled):
+    if getattr(driver, "blocking_enabled", None) == enabled:
+        return
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS if enabled else []})
+    driver.blocking_enabled = enabled
+
+def record_page_resources(driver, blocked, product_link):
+    try:
+        page = {"bytes": read_transferred_bytes(driver), "load_ms": driver.execute_script(PAGE_LOAD_SCRIPT)}
+    except Exception as e:
+        logger.warning(f"⚠️ Could not read the page resources: {e}")
+        return
+
+    with resource_lock:
+        stats = resource_stats["blocked" if blocked else "baseline"]
+        stats["pages"] += 1
+        stats["bytes"] += page["bytes"]
+        stats["load_ms"] += page["load_ms"]
+        baseline = resource_stats["baseline"]
+        baseline_pages = baseline["pages"]
+        baseline_bytes = baseline["bytes"] / baseline_pages if baseline_pages else None
+        baseline_load_ms = baseline["load_ms"] / baseline_pages if baseline_pages else None
+
+    message = f"📦 {page['bytes'] / 1024:.0f} KB, load {page['load_ms']:.0f} ms"
+    if blocked and baseline_bytes is not None:
+        message += (f" (saved {(baseline_bytes - page['bytes']) / 1024:.0f} KB, "
+                    f"load {page['load_ms'] - baseline_load_ms:+.0f} ms vs baseline)")
+    elif not blocked:
+        message += " (baseline, nothing blocked)"
+    logger.info(f"{message}: {product_link}")
+
+def log_resource_summary():
+    baseline = resource_stats["baseline"]
+    blocked = resource_stats["blocked"]
+    if not blocked["pages"]:
+        return
+    avg_bytes = blocked["bytes"] / blocked["pages"]
+    avg_load_ms = blocked["load_ms"] / blocked["pages"]
+    message = f"📦 {BLOCK_MODE}: {avg_bytes / 1024:.0f} KB and {avg_load_ms:.0f} ms load per page"
+    if baseline["pages"]:
+        saved_bytes = baseline["bytes"] / baseline["pages"] - avg_bytes
+        load_change_ms = avg_load_ms - baseline["load_ms"] / baseline["pages"]
+        message += f", {saved_bytes / 1024:.0f} KB saved and {load_change_ms:+.0f} ms load change per page"
+    logger.info(message)
+    print(message)
+
+
+# Condition based waits: instead of fixed sleeps, poll the page until it is ready (up to WAIT_TIMEOUT)
+# and keep track of how much time the run spends waiting compared to working
+timing_lock = threading.Lock()
+timing_stats = {"wait": 0.0, "total": 0.0, "links": 0, "background_wait": 0.0}
+page_worker = threading.local()  # page_worker.active is True on the link worker threads
+
+NEWSLETTER_CLOSED_SCRIPT = """
+const popup = document.querySelector("#mcforms-92356-113983");
+if (!popup || !popup.shadowRoot) return true;
+const closeBtn = popup.shadowRoot.querySelector("#el_bYfcVA1AUwL");
+return !closeBtn || closeBtn.getClientRects().length === 0;
+"""
+
+def record_wait_time(seconds):
+    # Only page workers' waits are part of the link times, image download and crawl threads are counted apart
+    key = "wait" if getattr(page_worker, "active", False) else "background_wait"
+    with timing_lock:
+        timing_stats[key] += seconds
+
+def record_link_time(seconds):
+    with timing_lock:
+        timing_stats["total"] += seconds
+        timing_stats["links"] += 1
+
+def wait_until(driver, condition, timeout=None):
+    """
+    WebDriverWait(...).until that adds the time spent to the wait statistics.
+    Raises TimeoutException like WebDriverWait when the condition is not met in time.
+    """
+    start = time.time()
+    try:
+        return WebDriverWait(driver, timeout or WAIT_TIMEOUT, poll_frequency=0.2).until(condition)
+    finally:
+        record_wait_time(time.time() - start)
+
+# Checks presence and visibility of several XPaths in one WebDriver call
+ELEMENTS_STATE_SCRIPT = """
+return arguments[0].map(xpath => {
+    const el = document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    return !!el && el.getClientRects().length > 0;
+});
+"""
+
+def wait_for_elements(driver, required, optional=(), timeout=None, optional_timeout=None):
+    """
+    Waits for a set of XPaths together and returns a dict of xpath -> found.
+    Returns as soon as every required XPath is visible, optional ones then get at most
+    optional_timeout more seconds. Raises TimeoutException when a required one is missing.
+    """
+    required = list(required)
+    optional = list(optional)
+    xpaths = required + optional
+    found = dict.fromkeys(xpaths, False)
+
+    def all_found(d, selectors):
+        found.update(zip(xpaths, d.execute_script(ELEMENTS_STATE_SCRIPT, xpaths)))
+        return all(found[xpath] for xpath in selectors)
+
+    try:
+        wait_until(driver, lambda d: all_found(d, required), timeout or ELEMENT_TIMEOUT)
+    except TimeoutException:
+        missing = [xpath for xpath in required if not found[xpath]]
+        logger.error(f"Required elements not found: {missing}")
+        raise
+
+    if optional:
+        try:
+            wait_until(driver, lambda d: all_found(d, optional), optional_timeout or OPTIONAL_ELEMENT_TIMEOUT)
+        except TimeoutException:
+            missing = [xpath for xpath in optional if not found[xpath]]
+            logger.info(f"Optional elements not found: {missing}")
+
+    return found
+
+def wait_for_network_idle(driver, timeout=None, quiet_period=0.5):
+    # The page is idle once it finished loading and no new resource was requested for quiet_period seconds
+    state = {"count": None, "since": time.time()}
+
+    def network_idle(d):
+        count = d.execute_script(
+            "return document.readyState === 'complete' ? performance.getEntriesByType('resource').length : -1;"
+        )
+        now = time.time()
+        if count != state["count"]:
+            state["count"], state["since"] = count, now
+            return False
+        return count >= 0 and now - state["since"] >= quiet_period
+
+    try:
+        wait_until(driver, network_idle, timeout)
+        return True
+    except Exception:
+        logger.warning("⚠️ Network did not become idle, continuing")
+        return False
+
+def log_timing_summary():
+    wait_seconds = timing_stats["wait"]
+    total_seconds = timing_stats["total"]
+    work_seconds = max(total_seconds - wait_seconds, 0.0)
+    wait_share = (wait_seconds / total_seconds * 100) if total_seconds else 0.0
+    message = (f"⏱️ {timing_stats['links']} link(s): {wait_seconds:.1f}s waiting ({wait_share:.0f}%), "
+               f"{work_seconds:.1f}s working")
+    if timing_stats["background_wait"]:
+        message += f", plus {timing_stats['background_wait']:.1f}s of rate limit and retry waits in image downloads and crawling"
+    logger.info(message)
+    print(message)
+
+
+# Retry policy and per-host rate budget. Retries wait an exponential backoff with full jitter, so failing
+# workers do not retry in lockstep, and the whole run may only spend RETRY_BUDGET_RATIO extra attempts per
+# first attempt (plus RETRY_BUDGET_MIN). Every page load, HTTP request and image download takes a token
+# from its host's bucket; 429/503 responses and bot-block pages halve the host's rate (honouring
+# Retry-After) and successful requests raise it back step by step.
+RETRY_BASE_DELAY = 1.0  # Seconds, doubled for every further attempt
+RETRY_MAX_DELAY = 30.0
+RETRY_BUDGET_RATIO = 0.1
+RETRY_BUDGET_MIN = 10
+HTTP_RETRIES = 3  # Attempts per HTTP request on 429/503 or a connection error
+HOST_RATE = 4.0  # Requests per second per host (override with --host-rate)
+HOST_BURST = 8
+HOST_MIN_RATE = 0.2
+HOST_RATE_STEP = 0.05  # Requests per second added back after each successful request
+SLOW_DOWN_STATUSES = {429, 503}
+BOT_BLOCK_TITLES = ("access denied", "attention required", "just a moment", "captcha", "are you a robot",
+                    "request unsuccessful", "pardon our interruption")
+retry_lock = threading.Lock()
+retry_stats = {"attempts": 0, "retries": 0, "denied": 0}
+host_lock = threading.Lock()
+host_buckets = {}
+
+def backoff_delay(attempt):
+    # Full jitter: anywhere between 0 and the exponential cap for this attempt
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+def record_attempt():
+    with retry_lock:
+        retry_stats["attempts"] += 1
+
+def take_retry_budget():
+    # True when the run may spend one more retry, counted against the attempts made so far
+    with retry_lock:
+        if retry_stats["retries"] >= RETRY_BUDGET_MIN + RETRY_BUDGET_RATIO * retry_stats["attempts"]:
+            retry_stats["denied"] += 1
+            return False
+        retry_stats["retries"] += 1
+        return True
+
+def get_host_bucket(host):
+    bucket = host_buckets.get(host)
+    if bucket is None:
+        bucket = host_buckets[host] = {"tokens": HOST_BURST, "rate": HOST_RATE, "updated": time.time(), "paused_until": 0.0}
+    return bucket
+
+def acquire_host_token(url):
+    # Waits until the host's bucket has a token; the wait counts as waiting time in the timing summary
+    host = urlsplit(url).netloc.lower()
+    waited = 0.0
+    while True:
+        with host_lock:
+            bucket = get_host_bucket(host)
+            now = time.time()
+            bucket["tokens"] = min(HOST_BURST, bucket["tokens"] + (now - bucket["updated"]) * bucket["rate"])
+            bucket["updated"] = now
+            if now >= bucket["paused_until"] and bucket["tokens"] >= 1:
+                bucket["tokens"] -= 1
+                break
+            delay = max(bucket["paused_until"] - now, (1 - bucket["tokens"]) / bucket["rate"])
+        time.sleep(delay)
+        waited += delay
+    if waited:
+        record_wait_time(waited)
+
+def slow_down_host(url, reason, retry_after=None):
+    host = urlsplit(url).netloc.lower()
+    with host_lock:
+        bucket = get_host_bucket(host)
+        bucket["rate"] = max(HOST_MIN_RATE, bucket["rate"] / 2)
+        bucket["tokens"] = 0
+        if retry_after:
+            bucket["paused_until"] = max(bucket["paused_until"], time.time() + retry_after)
+        rate = bucket["rate"]
+    logger.warning(f"🐢 Slowing down {host} to {rate:.2f} req/s: {reason}")
+
+def speed_up_host(url):
+    host = urlsplit(url).netloc.lower()
+    with host_lock:
+        bucket = get_host_bucket(host)
+        bucket["rate"] = min(HOST_RATE, bucket["rate"] + HOST_RATE_STEP)
+
+def parse_retry_after(value):
+    try:
+        return min(float(value), RETRY_MAX_DELAY * 4)
+    except (TypeError, ValueError):
+        return None  # Missing, or an HTTP date which is not worth parsing here
+
+def is_bot_block_title(title):
+    title = (title or "").strip().lower()
+    return any(marker in title for marker in BOT_BLOCK_TITLES)
+
+def get_html_title(text):
+    match = re.search(r"<title[^>]*>(.*?)</title>", text[:20000], re.IGNORECASE | re.DOTALL)
+    return match.group(1) if match else ""
+
+def is_origin_response(url, proxy):
+    # Over HTTPS a proxy only tunnels the connection (a failing tunnel raises ProxyError), so the status is the
+    # site's own. Over plain HTTP the proxy may have answered itself, which says nothing about the site.
+    return not proxy or urlsplit(url).scheme.lower() == "https"
+
+def throttled_get(session, url, **kwargs):
+    """
+    session.get behind the host's token bucket. 429/503 responses and connection errors are
+    retried up to HTTP_RETRIES times with backoff; responses that come from the site itself also
+    slow the host down. The last response (or error) is returned (or raised) as is.
+    """
+    record_attempt()
+    for attempt in range(1, HTTP_RETRIES + 1):
+        acquire_host_token(url)
+        proxy = choose_proxy()  # A failed attempt may go out through another proxy
+        if proxy:
+            kwargs["proxies"] = {"http": proxy, "https": proxy}
+        start = time.time()
+        try:
+            response = session.get(url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            record_proxy_result(proxy, False)
+            if attempt == HTTP_RETRIES or not take_retry_budget():
+                raise
+            delay = backoff_delay(attempt)
+        else:
+            blocked = response.status_code == 403 and not kwargs.get("stream") \
+                and is_bot_block_title(get_html_title(response.text))
+            record_proxy_result(proxy, response.status_code not in SLOW_DOWN_STATUSES and not blocked
+                                and response.status_code < 500, time.time() - start,
+                                blocked=blocked or response.status_code == 429)
+            if response.status_code not in SLOW_DOWN_STATUSES and not blocked:
+                speed_up_host(url)
+                return response
+            if is_origin_response(url, proxy):  # Otherwise only the proxy is charged, above
+                slow_down_host(url, f"HTTP {response.status_code}" + (" bot-block page" if blocked else ""),
+                               parse_retry_after(response.headers.get("Retry-After")))
+            if attempt == HTTP_RETRIES or not take_retry_budget():
+                return response
+            response.close()
+            delay = backoff_delay(attempt)
+        time.sleep(delay)
+        record_wait_time(delay)
+
+def log_retry_summary():
+    with retry_lock:
+        stats = dict(retry_stats)
+    with host_lock:
+        slowed = {host: bucket["rate"] for host, bucket in host_buckets.items() if bucket["rate"] < HOST_RATE}
+    summary = f"🔁 Retries: {stats['retries']} used, {stats['denied']} denied by the run budget"
+    if slowed:
+        summary += ", slowed hosts: " + ", ".join(f"{host} {rate:.2f} req/s" for host, rate in slowed.items())
+    logger.info(summary)
+    print(summary)
+
+
+# Chrome session pool: a fixed number of long-lived browsers that workers check out and return
+MAX_PAGES_PER_DRIVER = 50  # Recycle a session after this many pages
+driver_pool = queue.Queue()
+driver_pool_lock = threading.Lock()
+chromedriver_lock = threading.Lock()
+chromedriver_path = None
+drivers_created = 0
+
+def get_chromedriver_path():
+    # Resolve the driver binary once per run instead of once per browser
+    global chromedriver_path
+    with chromedriver_lock:
+        if chromedriver_path is None:
+            chromedriver_path = ChromeDriverManager().install()
+    return chromedriver_path
+
+def create_driver():
+    proxy = choose_proxy()  # The session keeps this proxy until it is retired
+    driver = webdriver.Chrome(service=Service(get_chromedriver_path()), options=get_chrome_options(proxy))
+    driver.pages_served = 0
+    driver.proxy = proxy
+    logger.info(f"🚀 Started new Chrome session{f' via {proxy}' if proxy else ''}")
+    seed_consent_state(driver)
+    return driver
+
+def get_driver():
+    """
+    Checks out a Chrome session from the pool. A new session is started only while the pool
+    is below DRIVER_POOL_SIZE, otherwise the caller waits for another worker to return one.
+    """
+    global drivers_created
+    while True:
+        try:
+            return driver_pool.get_nowait()
+        except queue.Empty:
+            pass
+
+        with driver_pool_lock:
+            can_create = drivers_created < DRIVER_POOL_SIZE
+            if can_create:
+                drivers_created += 1
+
+        if can_create:
+            try:
+                return create_driver()
+            except Exception:
+                with driver_pool_lock:
+                    drivers_created -= 1
+                raise
+
+        try:
+            return driver_pool.get(timeout=1)
+        except queue.Empty:
+            continue  # A session may have been retired meanwhile, re-check capacity
+
+def is_driver_alive(driver):
+    try:
+        driver.execute_script("return 1;")
+        return True
+    except Exception:
+        return False
+
+def reset_driver_session(driver):
+    # Clear cookies and storage so the next page starts from a clean state
+    try:
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        seed_consent_cookies(driver)  # Keep the consent, it is not page state
+        driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to reset Chrome session: {e}")
+        return False
+
+def retire_driver(driver):
+    global drivers_created
+    try:
+        driver.quit()
+    except Exception as e:
+        logger.warning(f"⚠️ Error while closing Chrome session: {e}")
+    with driver_pool_lock:
+        drivers_created -= 1
+
+def release_driver(driver, crashed=False):
+    """
+    Returns a Chrome session to the pool. Sessions that crashed, served MAX_PAGES_PER_DRIVER
+    pages or could not be reset are closed, and a fresh one is started on the next checkout.
+    """
+    driver.pages_served += 1
+    if crashed:
+        logger.warning("♻️ Recycling crashed Chrome session")
+        retire_driver(driver)
+    elif driver.pages_served >= MAX_PAGES_PER_DRIVER:
+        logger.info(f"♻️ Recycling Chrome session after {driver.pages_served} pages")
+        retire_driver(driver)
+    elif drivers_created > concurrency_state["limit"]:
+        logger.info("📉 Closing Chrome session, concurrency was lowered")
+        retire_driver(driver)
+    elif is_proxy_cooling_down(driver.proxy):
+        logger.info(f"🔌 Closing Chrome session, its proxy {driver.proxy} was taken out of the pool")
+        retire_driver(driver)
+    elif not reset_driver_session(driver):
+        retire_driver(driver)
+    else:
+        driver_pool.put(driver)
+
+def shutdown_driver_pool():
+    while True:
+        try:
+            driver = driver_pool.get_nowait()
+        except queue.Empty:
+            break
+        retire_driver(driver)
+
+
 # Thread function
 # Initialize a set to track invalid product links
 invalid_links = set()
@@ -86,413 +954,2159 @@ def scrape_product_thread(link):
         print(f"❌ Skipping previously identified invalid product link: {link}")
         return  # Skip this link if it's invalid
     
-    with semaphore:  # Limit active threads
-        if not validate_product_link(link):
-            # If invalid, mark in the invalid_links set and skip
-            invalid_links.add(link)
-            print(f"❌ Skipping invalid product link: {link}")
-            return
-        
-        # Proceed with scraping if the link is valid
-        product_data = scrape_with_retries(link)
-        if product_data:
-            with lock:
-                scraped_data.append(product_data)
-        else:
-            with lock:
-                failed_links.append(link)
+    # Take the job lease, another process may already be working on this link
+    if not claim_job(link):
+        print(f"⏭️ Skipping link already done or in progress: {link}")
+        return
 
-
-# Thread-safe list lock
+    # Validation happens on the page loaded for scraping, so each link is navigated once
+    start = time.time()
+    try:
+        product_data = scrape_product(link)
+    except Exception as e:
+        finish_job(link, "failed", str(e))
+        record_concurrency_sample(time.time() - start, False)
+        raise
+    record_link_time(time.time() - start)
+    record_concurrency_sample(time.time() - start, product_data is not None)
+    if product_data == INVALID_PAGE:
+        # If invalid, mark in the invalid_links set and skip
+        invalid_links.add(link)
+        finish_job(link, "invalid")
+        print(f"❌ Skipping invalid product link: {link}")
+        return
+
+    if product_data:
+        write_record(product_data)
+        finish_job(link, "done")
+    else:
+        write_failed_link(link)
+        finish_job(link, "failed")
+
+
+# Thread-safe output lock
 lock = threading.Lock()
-MAX_THREADS = 5  # You can increase or decrease this based on your system capacity
-semaphore = threading.Semaphore(MAX_THREADS)
+MAX_THREADS = 5  # Number of worker threads, increase or decrease based on your system capacity
+DRIVER_POOL_SIZE = MAX_THREADS  # One long-lived Chrome session per active thread
 
-# Read the Excel file containing product page links
+# Excel file containing product page links (override with --input)
 file_path = 'Box_Links.xlsx'  
-df = pd.read_excel(file_path)
 
-def scrape_with_retries(product_link):
-    for attempt in range(1, 3):  # Max 2 retries
+def scrape_with_retries(product_link, stages=None):
+    record_attempt()
+    for attempt in range(1, MAX_RETRIES + 1):
         print(f"🔁 Attempt {attempt} for {product_link}")
-        result = scrape_product_page(product_link)
+        result = scrape_price_page(product_link) if MODE == "price" else scrape_product_page(product_link, stages)
         if result:
-            return result
-        time.sleep(3)  # Short pause before retrying
-    print(f"❌ Failed after 2 attempts: {product_link}")
+            return result  # Product data, or INVALID_PAGE which is not worth retrying
+        if attempt < MAX_RETRIES:
+            if not take_retry_budget():
+                logger.warning(f"⚠️ Retry budget used up, not retrying {product_link}")
+                break
+            delay = backoff_delay(attempt)  # Jittered, so failing workers do not retry together
+            time.sleep(delay)
+            record_wait_time(delay)
+    print(f"❌ Failed after {attempt} attempt(s): {product_link}")
     return None
 
 
-# Wait function to handle elements
-def wait_for_element(driver, xpath_selector):
-    try:
-        WebDriverWait(driver, 30).until(  # Wait for element presence
-            EC.presence_of_element_located((By.XPATH, xpath_selector))
-        )
-        WebDriverWait(driver, 30).until(  # Additional wait for visibility
-            EC.visibility_of_element_located((By.XPATH, xpath_selector))
-        )
-    except Exception as e:
-        logger.error(f"Exception while waiting for element [{xpath_selector}]: {e}")
-        logger.error(traceback.format_exc())
+def check_bot_block(driver, product_link):
+    # A bot-block page is not retried straight away: the host is slowed down and the attempt fails
+    if is_bot_block_title(driver.title):
+        slow_down_host(product_link, f"bot-block page '{driver.title}'")
+        record_proxy_result(getattr(driver, "proxy", None), False, blocked=True)
+        raise RuntimeError(f"Bot-block page instead of the product: {driver.title}")
+    speed_up_host(product_link)
 
 def scroll_to_bottom(driver):
-    # Scroll down to load all content on the page
+    # Scroll down to load all content on the page, and wait until the lazy content finished loading
     driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-    time.sleep(3) 
+    wait_for_network_idle(driver)
     # Scroll up to the top of the page
     driver.execute_script("window.scrollTo(0, 0);")  # Scroll up
-    time.sleep(3) 
 
 # Main scraping function per thread
-def scrape_product_page(product_link):
-    options = get_chrome_options()
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=get_chrome_options())
-    wait = WebDriverWait(driver, 20)
+def scrape_product_page(product_link, stages=None):
+    stages = STAGES if stages is None else stages
+    driver = get_driver()
+    crashed = False
 
     try:
+        blocked = use_blocking_for_next_page()
+        apply_resource_blocking(driver, blocked and BLOCK_MODE == "blocklist")
+        start_page_resources(driver)
+        acquire_host_token(product_link)
+        load_start = time.time()
         driver.get(product_link)
-        scroll_to_bottom(driver)
+        check_bot_block(driver, product_link)
+        valid = validate_product_link(driver)
+        if valid is None:
+            logger.warning(f"⚠️ Page did not load, not marking it invalid: {product_link}")
+            record_proxy_result(driver.proxy, False)  # A dead or blocking proxy shows up as a Chrome error page
+            return None  # Retried by scrape_with_retries, recorded as failed if it never loads
+        if not valid:
+            logger.warning(f"❌ Not a product page: {product_link}")
+            return INVALID_PAGE
+
+        record_proxy_result(driver.proxy, True, time.time() - load_start)
+        if stages & LAZY_STAGES:
+            scroll_to_bottom(driver)
+        record_page_resources(driver, blocked, product_link)
         logger.info(f"Scraping {product_link}")
-        handle_cookie_popup(driver)      # Existing cookie handler
-        handle_newsletter_popup(driver)  # Dismiss newsletter popup
-
-        # Wait for required elements
-        product_name_path = '//*[@id="maincontent"]/app-dynamic-page/app-pdp/section/div/div[1]/div[2]/div[1]/h1'
-        product_mpn_path = '//*[@id="maincontent"]/app-dynamic-page/app-pdp/section/div/div[1]/div[2]/div[1]/div[1]/span'
-        product_price_path = '//*[@id="maincontent"]/app-dynamic-page/app-pdp/section[1]/div/div[1]/div[2]/div[1]/div[3]/div/div[1]/div[1]/span'
-        product_list_price_path = '//*[@id="maincontent"]/app-dynamic-page/app-pdp/section[1]/div/div[1]/div[2]/div[1]/div[3]/div/div[2]/span'
-        breadcrumb_path = '//*[@id="maincontent"]/app-dynamic-page/app-pdp/section/app-breadcrumbs/div/div/div/div'
-        image_base_xpath = '//*[@id="maincontent"]/app-dynamic-page/app-pdp/section[1]/div/div[1]/div[1]/div/app-custom-pdp-swiper/div[2]/div[2]/div/div[2]/div'
-        tags_xpath = '//*[@id="maincontent"]/app-dynamic-page/app-pdp/section[1]/div/div[1]/div[2]/div[1]/div[2]'
-
-        # Wait for elements
-        wait_for_element(driver, product_name_path)
-        wait_for_element(driver, product_mpn_path)
-        wait_for_element(driver, product_price_path)
-        wait_for_element(driver, product_list_price_path)
-        wait_for_element(driver, breadcrumb_path)
-        wait_for_element(driver, tags_xpath)
-
-        for i in range(4):
-            wait_for_element(driver, f"{image_base_xpath}[{i+1}]/img")
+        handle_popups(driver)  # Consent is pre-seeded, so this is normally a single quick check
+
+        # Wait for elements: name, MPN and price are required, the rest may be missing
+        # (e.g. no list price on a non-discounted product) and only get a short grace period
+        optional = [PRODUCT_LIST_PRICE_XPATH]
+        if "breadcrumbs" in stages:
+            optional.append(BREADCRUMB_XPATH)
+        if "tags" in stages:
+            optional.append(TAGS_XPATH)
+        if "key_features" in stages:
+            optional.append(KEY_FEATURES_XPATH)
+        if "images" in stages:
+            optional += [f"{IMAGE_BASE_XPATH}[{i+1}]/img" for i in range(4)]
+        wait_for_elements(
+            driver,
+            required=[PRODUCT_NAME_XPATH, PRODUCT_MPN_XPATH, PRODUCT_PRICE_XPATH],
+            optional=optional,
+        )
 
-        # Extract core product info
-        product_name = driver.find_element(By.XPATH, product_name_path).text
-        product_mpn = driver.find_element(By.XPATH, product_mpn_path).text.replace("MPN:", "").strip()
-        product_price = driver.find_element(By.XPATH, product_price_path).text.replace(" INC VAT", "").strip()
-        product_list_price = driver.find_element(By.XPATH, product_list_price_path).text
-        if "SAVE" in product_list_price:
-            product_list_price = product_list_price.split(" SAVE")[0].strip()
-        product_list_price = product_list_price.replace("was", "").strip()
-
-        # Breadcrumbs
-        sub_category, child_category, grand_child_categories = process_breadcrumbs(driver)
-
-        # Download up to 4 images
-        image_names = []
-        for idx in range(4):
-            try:
-                image_xpath = f"{image_base_xpath}[{idx+1}]/img"
-                image_url = driver.find_element(By.XPATH, image_xpath).get_attribute('src')
-                image_name = download_image(image_url, product_mpn, None if idx == 0 else idx, "price")
-                image_names.append(image_name)
-            except Exception as e:
-                logger.warning(f"⚠️ Failed to get image at index {idx+1}: {e}")
-                image_names.append(None)
+        if EXTRACTION_MODE == "snapshot":
+            return scrape_page_snapshot(driver, product_link, stages)
 
-        # Scrape additional details
-        tags = scrape_tags(driver)
-        key_features = scrape_key_features(driver)
-        specifications = scrape_specifications(driver, wait)
-        faqs = scrape_faqs(driver)
+        # Extract core product info
+        product_name = driver.find_element(By.XPATH, PRODUCT_NAME_XPATH).text
+        product_mpn = clean_mpn(driver.find_element(By.XPATH, PRODUCT_MPN_XPATH).text)
+        product_price = clean_price(driver.find_element(By.XPATH, PRODUCT_PRICE_XPATH).text)
+        list_price_elements = driver.find_elements(By.XPATH, PRODUCT_LIST_PRICE_XPATH)
+        product_list_price = clean_list_price(list_price_elements[0].text) if list_price_elements else ""
 
-        return {
+        record = {
             "Link": product_link,
             'Product Name': product_name,
             'Product MPN': product_mpn,
             'Product Current Price': product_price,
             'Product List Price': product_list_price,
-            'Sub Category': sub_category,
-            'Child Category': child_category,
-            'Grand Child Categories': grand_child_categories,
-            'Thumbnail_Image': image_names[0],
-            'Additional_Image_1': image_names[1],
-            'Additional_Image_2': image_names[2],
-            'Additional_Image_3': image_names[3],
-            'Tags': json.dumps(tags),
-            'Key_Features': key_features,
-            'Specifications': specifications,
-            'FAQs': faqs
         }
 
+        def scrape_images():
+            # Download up to 4 images
+            image_names = []
+            for idx in range(4):
+                try:
+                    image_xpath = f"{IMAGE_BASE_XPATH}[{idx+1}]/img"
+                    image_url = driver.find_element(By.XPATH, image_xpath).get_attribute('src')
+                    image_names.append(download_image(image_url, product_mpn, None if idx == 0 else idx, "price"))
+                except Exception as e:
+                    logger.warning(f"⚠️ Failed to get image at index {idx+1}: {e}")
+                    image_names.append(None)
+            return dict(zip(STAGE_FIELDS["images"], image_names))
+
+        # Scrape additional details, only the requested stages run and a failed stage is retried on its own
+        stage_functions = {
+            "breadcrumbs": lambda: dict(zip(STAGE_FIELDS["breadcrumbs"], process_breadcrumbs(driver))),
+            "images": scrape_images,
+            "tags": lambda: {'Tags': json.dumps(scrape_tags(driver))},
+            "key_features": lambda: {'Key_Features': scrape_key_features(driver)},
+            "specifications": lambda: {'Specifications': scrape_specifications(driver)},
+            "faqs": lambda: {'FAQs': scrape_faqs(driver)},
+        }
+        statuses = run_stages(record, {stage: function for stage, function in stage_functions.items() if stage in stages})
+        record = mark_not_collected(record, stages)
+        record = {field: record.get(field) for field in RECORD_FIELDS}  # Same column order as the other paths
+        record[STAGE_STATUS_FIELD] = statuses
+        return record
+
     except Exception as e:
         logger.error(f"❌ Error scraping {product_link}: {e}")
         logger.error(traceback.format_exc())
+        if isinstance(e, TimeoutException):
+            record_concurrency_timeout()
+            record_proxy_result(driver.proxy, False)  # Blocking through a proxy mostly shows up as timeouts
+        crashed = not is_driver_alive(driver)
         return None
     finally:
-        driver.quit()
+        release_driver(driver, crashed)
 
 # Function to process breadcrumbs
 def process_breadcrumbs(driver):
-    breadcrumb_section_xpath = '//*[@id="maincontent"]/app-dynamic-page/app-pdp/section[1]/app-breadcrumbs/div/div/div'  # Breadcrumb container
-    try:
-        breadcrumb_elements = driver.find_elements(By.XPATH, breadcrumb_section_xpath + '/div/a')
-        
-        sub_category = breadcrumb_elements[1].text.strip() if len(breadcrumb_elements) > 1 else None
-        child_category = breadcrumb_elements[2].text.strip() if len(breadcrumb_elements) > 2 else None
-        grand_child_categories = [breadcrumb_elements[i].text.strip() for i in range(3, len(breadcrumb_elements))]
+    breadcrumb_elements = driver.find_elements(By.XPATH, BREADCRUMB_LINKS_XPATH)
+    return split_breadcrumbs([element.text for element in breadcrumb_elements])
 
-        if sub_category and '>' in sub_category:
-            sub_category = sub_category.split('>')[-1].strip()
-        if child_category and '>' in child_category:
-            child_category = child_category.split('>')[-1].strip()
+# Turns breadcrumb link texts into sub category, child category and grand child categories
+def split_breadcrumbs(breadcrumb_texts):
+    sub_category = breadcrumb_texts[1].strip() if len(breadcrumb_texts) > 1 else None
+    child_category = breadcrumb_texts[2].strip() if len(breadcrumb_texts) > 2 else None
+    grand_child_categories = [breadcrumb_texts[i].strip() for i in range(3, len(breadcrumb_texts))]
 
-        grand_child_categories = [text.strip() for text in grand_child_categories if '>' not in text]
-        
-        return sub_category, child_category, grand_child_categories
+    if sub_category and '>' in sub_category:
+        sub_category = sub_category.split('>')[-1].strip()
+    if child_category and '>' in child_category:
+        child_category = child_category.split('>')[-1].strip()
 
-    except Exception as e:
-        logger.error(f"Error retrieving breadcrumbs: {e}")
-        return None, None, []
+    grand_child_categories = [text.strip() for text in grand_child_categories if '>' not in text]
+
+    return sub_category, child_category, grand_child_categories
+
+def clean_mpn(text):
+    return text.replace("MPN:", "").strip()
+
+def clean_price(text):
+    return text.replace(" INC VAT", "").strip()
+
+def clean_list_price(text):
+    if "SAVE" in text:
+        text = text.split(" SAVE")[0].strip()
+    return text.replace("was", "").strip()
 
 # Function to scrape specifications dynamically from tables
 
-def scrape_specifications(driver, wait):
+def scrape_specifications(driver):
+    # Errors and timeouts are raised to run_stages, which retries only this stage
     specifications = {}
 
-    try:
-        # Step 1: Scroll to and Click the Specifications tab
-        spec_tab_xpath = '//*[@id="accordion"]/p-accordion/div/p-accordiontab[2]'
-        try:
-            wait.until(EC.presence_of_element_located((By.XPATH, spec_tab_xpath)))
-            spec_tab = driver.find_element(By.XPATH, spec_tab_xpath)
-            driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", spec_tab)
-            time.sleep(3)
-            if not spec_tab.get_attribute("aria-expanded") == "true":
-                spec_tab.click()
-                time.sleep(3)
-        except Exception as e:
-            logger.error(f"❌ Error clicking spec tab: {e}")
-            specifications["Specs"] = "Specs tab not clickable"
-            return json.dumps(specifications, indent=4)
-
-        # Step 2: Wait for content to load
-        spec_main_header_xpath = '//*[@id="index-1_header_action"]/span[2]'
-        spec_main_div_xpath = '//*[@id="index-1_content"]/div/div'
-        wait.until(EC.presence_of_element_located((By.XPATH, spec_main_header_xpath)))
-        wait.until(EC.presence_of_element_located((By.XPATH, spec_main_div_xpath)))
-
-        # Step 3: Get main header
-        main_header = driver.find_element(By.XPATH, spec_main_header_xpath).text.strip()
-        specifications["MainHeader"] = main_header
-        specifications["Specs"] = []
-
-        # Step 4: Scrape spec tables
-        tables = driver.find_elements(By.XPATH, spec_main_div_xpath + '/table')
-        headers = driver.find_elements(By.XPATH, spec_main_div_xpath + '/p')
-
-        for i, table in enumerate(tables):
-            title = headers[i].text.strip() if i < len(headers) else f"Table {i+1}"
-            table_data = []
-
-            for row in table.find_elements(By.TAG_NAME, "tr"):
-                columns = row.find_elements(By.TAG_NAME, "td")
-                if len(columns) == 2:
-                    key = columns[0].text.strip()
-                    value = columns[1].text.strip()
-                    if key and value:
-                        table_data.append({"Key": key, "Value": value})
-
-            if table_data:
-                specifications["Specs"].append({"Header": title, "Attributes": table_data})
-
-        # Step 5: If no data found
-        if not specifications["Specs"]:
-            specifications["Specs"] = "No specifications found"
-
-    except Exception as e:
-        logger.error(f"❌ Error retrieving specifications: {e}")
-        specifications = {"Specs": "Error retrieving specifications"}
+    # Step 1: Scroll to and Click the Specifications tab
+    spec_tab_xpath = '//*[@id="accordion"]/p-accordion/div/p-accordiontab[2]'
+    wait_until(driver, EC.presence_of_element_located((By.XPATH, spec_tab_xpath)))
+    spec_tab = driver.find_element(By.XPATH, spec_tab_xpath)
+    driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", spec_tab)
+    wait_until(driver, lambda d: d.execute_script(
+        "const r = arguments[0].getBoundingClientRect(); return r.top >= 0 && r.bottom <= window.innerHeight;",
+        spec_tab,
+    ))  # Smooth scroll finished
+    if not spec_tab.get_attribute("aria-expanded") == "true":
+        spec_tab.click()  # Step 2 waits for the content it reveals
+
+    # Step 2: Wait for content to load
+    spec_main_header_xpath = SPEC_MAIN_HEADER_XPATH
+    spec_main_div_xpath = SPEC_MAIN_DIV_XPATH
+    wait_until(driver, EC.presence_of_element_located((By.XPATH, spec_main_header_xpath)))
+    wait_until(driver, EC.presence_of_element_located((By.XPATH, spec_main_div_xpath)))
+
+    # Step 3: Get main header
+    main_header = driver.find_element(By.XPATH, spec_main_header_xpath).text.strip()
+    specifications["MainHeader"] = main_header
+    specifications["Specs"] = []
+
+    # Step 4: Scrape spec tables
+    tables = driver.find_elements(By.XPATH, spec_main_div_xpath + '/table')
+    headers = driver.find_elements(By.XPATH, spec_main_div_xpath + '/p')
+
+    for i, table in enumerate(tables):
+        title = headers[i].text.strip() if i < len(headers) else f"Table {i+1}"
+        table_data = []
+
+        for row in table.find_elements(By.TAG_NAME, "tr"):
+            columns = row.find_elements(By.TAG_NAME, "td")
+            if len(columns) == 2:
+                key = columns[0].text.strip()
+                value = columns[1].text.strip()
+                if key and value:
+                    table_data.append({"Key": key, "Value": value})
+
+        if table_data:
+            specifications["Specs"].append({"Header": title, "Attributes": table_data})
+
+    # Step 5: If no data found
+    if not specifications["Specs"]:
+        specifications["Specs"] = "No specifications found"
 
     return json.dumps(specifications, indent=4)
 
 
 # Function to download and save images
-def download_image(image_url, product_mpn, img_count=None, image_type="price"):
+# Image download stage: page workers only hand the image URLs to a queue and move on, a small pool of
+# downloader threads shares one keep-alive connection pool and streams each image to disk in chunks.
+IMAGE_FOLDER = "product_images"
+# Content-addressed store: each distinct image is kept once under its SHA-256 in IMAGE_STORE, an index maps
+# every image URL to its hash and ETag/Last-Modified for conditional requests, and the MPN file names in
+# IMAGE_FOLDER are hardlinks to the stored files (copies where hardlinks are not supported).
+IMAGE_STORE = os.path.join(IMAGE_FOLDER, ".store")
+IMAGE_WORKERS = 8
+IMAGE_QUEUE_SIZE = IMAGE_WORKERS * 20  # A full queue makes page workers wait instead of buffering URLs
+IMAGE_CHUNK_SIZE = 64 * 1024
+IMAGE_TIMEOUT = (5, 30)  # Connect and read timeouts in seconds
+UNSUPPORTED_IMAGE_EXTENSIONS = (".mp4", ".webm", ".mov", ".m3u8", ".svg")
+image_queue = queue.Queue(maxsize=IMAGE_QUEUE_SIZE)
+image_threads = []
+image_lock = threading.Lock()
+image_stats = {"downloaded": 0, "revalidated": 0, "deduplicated": 0, "skipped": 0, "failed": 0, "bytes": 0}
+missing_images = set()  # File names already written into records whose download was skipped or failed
+image_index = None
+image_index_lock = threading.Lock()
+
+image_session = requests.Session()
+image_session.headers.update({"User-Agent": USER_AGENT})
+image_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=IMAGE_WORKERS))
+image_session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=IMAGE_WORKERS))
+
+def record_image_result(result, img_path, size=0):
+    with image_lock:
+        image_stats[result] += 1
+        image_stats["bytes"] += size
+        if result in ("skipped", "failed"):
+            missing_images.add(os.path.basename(img_path))
+        else:
+            missing_images.discard(os.path.basename(img_path))
+
+def open_image_index():
+    global image_index
+    os.makedirs(IMAGE_STORE, exist_ok=True)
+    image_index = sqlite3.connect(os.path.join(IMAGE_STORE, "index.db"), timeout=30, check_same_thread=False)
+    image_index.execute("PRAGMA journal_mode=WAL")
+    image_index.execute("""
+        CREATE TABLE IF NOT EXISTS images (
+            url TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            updated_at REAL NOT NULL
+        )
+    """)
+    # Manifest of the MPN file names, also where a name could not be hardlinked
+    image_index.execute("""
+        CREATE TABLE IF NOT EXISTS names (
+            name TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            url TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+
+def close_image_index():
+    global image_index
+    if image_index:
+        image_index.close()
+        image_index = None
+
+def get_blob_path(sha256):
+    return os.path.join(IMAGE_STORE, sha256[:2], sha256)
+
+def link_file(source_path, target_path):
+    # Points target_path at source_path with a hardlink, replacing whatever the name pointed to before
+    if os.path.exists(target_path) and os.path.samefile(source_path, target_path):
+        return
+    temp_path = f"{target_path}.{os.getpid()}-{threading.get_ident()}.link"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
     try:
-        img_data = requests.get(image_url).content
-        img_folder = "product_images"
-        os.makedirs(img_folder, exist_ok=True)
+        os.link(source_path, temp_path)
+    except OSError:
+        shutil.copyfile(source_path, temp_path)  # e.g. a file system without hardlinks
+    os.replace(temp_path, target_path)
+
+def link_image_name(sha256, img_path, image_url):
+    # Points the MPN file name at the stored image and records it in the names manifest
+    link_file(get_blob_path(sha256), img_path)
+    with image_index_lock, image_index:
+        image_index.execute(
+            "INSERT INTO names (name, sha256, url, updated_at) VALUES (?, ?, ?, ?) ON CONFLICT (name) DO UPDATE SET "
+            "sha256 = excluded.sha256, url = excluded.url, updated_at = excluded.updated_at",
+            (os.path.basename(img_path), sha256, image_url, time.time()),
+        )
 
-        # 🛠️ Fix: Avoid double hyphen when img_count is None
-        if img_count is None:
-            img_name = f"{product_mpn}-{image_type}.jpg".lower()  # ✅ Correct: NX.KTDEK.002-price.jpg
+def fetch_image(image_url, img_path):
+    """
+    Gets one image into the content-addressed store and links its MPN file name to it. A URL
+    seen before is revalidated with its ETag/Last-Modified and a 304 costs no image bytes; new
+    bytes are streamed to a temporary file while hashing and kept only if that hash is new.
+    Responses that are not images (videos, HTML error pages) are skipped.
+    """
+    with image_index_lock:
+        row = image_index.execute(
+            "SELECT sha256, etag, last_modified FROM images WHERE url = ?", (image_url,)
+        ).fetchone()
+    headers = {}
+    if row and os.path.exists(get_blob_path(row[0])):
+        if row[1]:
+            headers["If-None-Match"] = row[1]
+        if row[2]:
+            headers["If-Modified-Since"] = row[2]
+
+    temp_path = None
+    try:
+        with throttled_get(image_session, image_url, headers=headers, stream=True, timeout=IMAGE_TIMEOUT) as response:
+            if response.status_code == 304:
+                link_image_name(row[0], img_path, image_url)
+                record_image_result("revalidated", img_path)
+                submit_renditions(row[0], img_path)
+                return
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            if not content_type.startswith("image/") or content_type == "image/svg+xml":
+                logger.warning(f"⚠️ Skipped unsupported image type {content_type or 'unknown'}: {image_url}")
+                record_image_result("skipped", img_path)
+                return
+            digest = hashlib.sha256()
+            size = 0
+            temp_path = os.path.join(IMAGE_STORE, f"{os.getpid()}-{threading.get_ident()}.part")  # Shards share the store
+            with open(temp_path, "wb") as f:
+                for chunk in response.iter_content(IMAGE_CHUNK_SIZE):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+
+        sha256 = digest.hexdigest()
+        blob_path = get_blob_path(sha256)
+        if os.path.exists(blob_path):
+            os.remove(temp_path)  # Same bytes as an image already stored (shared artwork or unchanged URL)
+            record_image_result("deduplicated", img_path, size)
         else:
-            img_name = f"{product_mpn}-{img_count}-{image_type}.jpg".lower()  # ✅ Correct: NX.KTDEK.002-1-price.jpg
-
-        img_path = os.path.join(img_folder, img_name)
-        with open(img_path, 'wb') as f:
-            f.write(img_data)
-        logger.info(f"✅ Downloaded: {img_name}")
-        return img_name
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.replace(temp_path, blob_path)
+            record_image_result("downloaded", img_path, size)
+        temp_path = None
+
+        with image_index_lock, image_index:
+            image_index.execute(
+                "INSERT INTO images (url, sha256, etag, last_modified, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (url) DO UPDATE SET sha256 = excluded.sha256, etag = excluded.etag, "
+                "last_modified = excluded.last_modified, updated_at = excluded.updated_at",
+                (image_url, sha256, etag, last_modified, time.time()),
+            )
+        link_image_name(sha256, img_path, image_url)
+        submit_renditions(sha256, img_path)
+        logger.info(f"✅ Downloaded: {os.path.basename(img_path)}")
     except Exception as e:
-        logger.error(f"❌ Failed to download image: {e}")
+        record_image_result("failed", img_path)
+        logger.error(f"❌ Failed to download image {image_url}: {e}")
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+# Optional rendition stage (--renditions, needs Pillow): every stored image is decoded once in a process
+# pool, which writes all configured renditions from that decoded image. Renditions are cached per image
+# hash in IMAGE_STORE/renditions and linked as product_images/<rendition>/<MPN name>. Dimensions and byte
+# sizes are joined into the records as Image_Details when the run finishes.
+RENDITION_SPECS = {
+    "thumbnail": {"size": (200, 200), "format": "JPEG", "extension": "jpg", "quality": 85},
+    "web": {"size": (800, 800), "format": "JPEG", "extension": "jpg", "quality": 85},
+    "webp": {"size": (800, 800), "format": "WEBP", "extension": "webp", "quality": 80},
+}
+RENDITIONS = []  # Rendition names to produce, empty turns the stage off
+RENDITION_WORKERS = os.cpu_count() or 1
+rendition_pool = None
+rendition_lock = threading.Lock()
+rendition_results = {}
+
+def render_image(blob_path, sha256, img_path, renditions):
+    """
+    Runs in a worker process: decodes the stored image once and writes each rendition that is
+    not cached yet, then links the MPN named files. Returns the original and rendition sizes.
+    """
+    cache_paths = {name: os.path.join(IMAGE_STORE, "renditions", name, f"{sha256}.{RENDITION_SPECS[name]['extension']}")
+                   for name in renditions}
+    with Image.open(blob_path) as original:
+        details = {"width": original.width, "height": original.height, "bytes": os.path.getsize(blob_path),
+                   "renditions": {}}
+        decoded = None
+        for name, cache_path in cache_paths.items():
+            spec = RENDITION_SPECS[name]
+            if not os.path.exists(cache_path):
+                if decoded is None:
+                    decoded = original.convert("RGB")
+                rendition = decoded.copy()
+                rendition.thumbnail(spec["size"])
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                temp_path = f"{cache_path}.{os.getpid()}.part"
+                rendition.save(temp_path, spec["format"], quality=spec["quality"])
+                os.replace(temp_path, cache_path)
+
+            target_dir = os.path.join(os.path.dirname(img_path), name)
+            os.makedirs(target_dir, exist_ok=True)
+            target_path = os.path.join(target_dir, f"{os.path.splitext(os.path.basename(img_path))[0]}.{spec['extension']}")
+            link_file(cache_path, target_path)
+            with Image.open(cache_path) as rendered:  # Reads the header only, no decode
+                details["renditions"][name] = {"file": os.path.relpath(target_path, IMAGE_FOLDER),
+                                               "width": rendered.width, "height": rendered.height,
+                                               "bytes": os.path.getsize(cache_path)}
+    return details
+
+def store_rendition_result(img_name, future):
+    try:
+        details = future.result()
+    except Exception as e:
+        logger.error(f"❌ Failed to render {img_name}: {e}")
+        return
+    with rendition_lock:
+        rendition_results[img_name] = details
+
+def start_rendition_pool():
+    """
+    Starts the rendition worker processes. Called before the run starts any thread: forking a
+    process whose Chrome workers and downloader threads hold locks can deadlock the children.
+    The worker processes are only forked on the first submit, so a no-op task is run right away.
+    """
+    global rendition_pool
+    if RENDITIONS and rendition_pool is None:
+        rendition_pool = ProcessPoolExecutor(max_workers=RENDITION_WORKERS)
+        rendition_pool.submit(os.getpid).result()
+
+def submit_renditions(sha256, img_path):
+    if not RENDITIONS:
+        return
+    with rendition_lock:
+        if rendition_pool is None:
+            return  # Only started by run_shard
+        future = rendition_pool.submit(render_image, get_blob_path(sha256), sha256, img_path, list(RENDITIONS))
+    img_name = os.path.basename(img_path)
+    future.add_done_callback(lambda future: store_rendition_result(img_name, future))
+
+def stop_rendition_pool():
+    global rendition_pool
+    with rendition_lock:
+        pool, rendition_pool = rendition_pool, None
+    if pool:
+        pool.shutdown(wait=True)
+
+def join_image_details(records_filename):
+    """
+    Runs once the image downloads finished: clears the image fields whose download was skipped
+    or failed (records get their file names before the download runs) and adds Image_Details
+    (original and rendition dimensions and byte sizes per image field) to the records of an
+    output file, rewriting it line by line like update_prices.
+    """
+    with rendition_lock:
+        results = dict(rendition_results)
+    with image_lock:
+        missing = {name for name in missing_images if not os.path.exists(os.path.join(IMAGE_FOLDER, name))}
+    if not results and not missing:
+        return
+    image_fields = STAGE_FIELDS["images"]
+    cleared = 0
+    temp_filename = records_filename + ".tmp"
+    with open(temp_filename, "w", encoding="utf-8") as out:
+        for record in iter_jsonl_records(records_filename):
+            missing_fields = [field for field in image_fields if record.get(field) in missing]
+            for field in missing_fields:
+                record[field] = None
+            if missing_fields and "images" in (record.get(STAGE_STATUS_FIELD) or {}):
+                record[STAGE_STATUS_FIELD]["images"] = "empty" if is_stage_empty("images", record) else "ok"
+            cleared += len(missing_fields)
+            details = {field: results[record[field]] for field in image_fields if record.get(field) in results}
+            if details:
+                record["Image_Details"] = details
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    os.replace(temp_filename, records_filename)
+    if cleared:
+        logger.info(f"🖼️ Cleared {cleared} image file name(s) that were not downloaded from {records_filename}")
+        print(f"🖼️ Cleared {cleared} image file name(s) that were not downloaded from {records_filename}")
+    if results:
+        logger.info(f"🖼️ Joined rendition details of {len(results)} image(s) into {records_filename}")
+        print(f"🖼️ Joined rendition details of {len(results)} image(s) into {records_filename}")
+
+def prune_image_store():
+    """
+    Deletes stored images that no URL in the index and no MPN file name refers to any more,
+    e.g. old versions of images that changed. Keeps the store's disk use bounded.
+    """
+    open_image_index()
+    with image_index_lock:
+        referenced = {sha256 for (sha256,) in image_index.execute("SELECT sha256 FROM images UNION SELECT sha256 FROM names")}
+    removed = freed = 0
+    for blob_path in glob.glob(os.path.join(IMAGE_STORE, "??", "*")) + glob.glob(os.path.join(IMAGE_STORE, "renditions", "*", "*")):
+        name = os.path.basename(blob_path).split(".")[0]
+        if name not in referenced:
+            freed += os.path.getsize(blob_path)
+            os.remove(blob_path)
+            removed += 1
+    close_image_index()
+    logger.info(f"🧹 Removed {removed} unreferenced image(s) from {IMAGE_STORE}, {freed / 1024 / 1024:.1f} MB freed")
+    print(f"🧹 Removed {removed} unreferenced image(s) from {IMAGE_STORE}, {freed / 1024 / 1024:.1f} MB freed")
+
+def image_worker():
+    while True:
+        item = image_queue.get()
+        try:
+            if item is None:
+                return
+            fetch_image(*item)
+        finally:
+            image_queue.task_done()
+
+def start_image_downloader():
+    with image_lock:
+        if image_threads:
+            return
+        open_image_index()
+        for _ in range(IMAGE_WORKERS):
+            thread = threading.Thread(target=image_worker, daemon=True)
+            thread.start()
+            image_threads.append(thread)
+
+def stop_image_downloader():
+    # Waits for the queued downloads to finish, then stops the downloader threads
+    with image_lock:
+        threads = list(image_threads)
+        image_threads.clear()
+    for _ in threads:
+        image_queue.put(None)
+    for thread in threads:
+        thread.join()
+    close_image_index()
+
+def log_image_summary():
+    with image_lock:
+        stats = dict(image_stats)
+    if not any(stats.values()):
+        return
+    summary = (f"🖼️ Images: {stats['downloaded']} new, {stats['deduplicated']} already stored, "
+               f"{stats['revalidated']} unchanged (304), {stats['skipped']} skipped as unsupported, {stats['failed']} failed, "
+               f"{stats['bytes'] / 1024 / 1024:.1f} MB transferred")
+    logger.info(summary)
+    print(summary)
+
+def download_image(image_url, product_mpn, img_count=None, image_type="price"):
+    """
+    Queues the image for the download stage and returns the file name it will be saved under,
+    without waiting for the download. Returns None for video and other unsupported URLs.
+    """
+    if not image_url or urlsplit(image_url).path.lower().endswith(UNSUPPORTED_IMAGE_EXTENSIONS):
+        logger.info(f"⏭️ Ignoring unsupported image URL: {image_url}")
         return None
 
+    # 🛠️ Fix: Avoid double hyphen when img_count is None
+    if img_count is None:
+        img_name = f"{product_mpn}-{image_type}.jpg".lower()  # ✅ Correct: NX.KTDEK.002-price.jpg
+    else:
+        img_name = f"{product_mpn}-{img_count}-{image_type}.jpg".lower()  # ✅ Correct: NX.KTDEK.002-1-price.jpg
+
+    start_image_downloader()
+    image_queue.put((image_url, os.path.join(IMAGE_FOLDER, img_name)))
+    return img_name
+
 # Function to scrape tags
 def scrape_tags(driver):
     tags = []
-    try:
-        tags_section_xpath = '//*[@id="maincontent"]/app-dynamic-page/app-pdp/section[1]/div/div[1]/div[2]/div[1]/div[2]'
-        toast_elements = driver.find_elements(By.XPATH, tags_section_xpath + '/div/app-product-toast')
-        
-        for toast_element in toast_elements:
-            toast_text = toast_element.find_element(By.XPATH, './div/span').text.strip()
-            if toast_text:
-                tags.append(toast_text)
-        
-        if not tags:
-            tags.append("N/A")
-        
-        return {"Tags": tags}
-    except Exception as e:
-        logger.error(f"Error retrieving tags: {e}")
-        return {"Tags": "Error retrieving tags"}
+    tags_section_xpath = TAGS_XPATH
+    toast_elements = driver.find_elements(By.XPATH, tags_section_xpath + '/div/app-product-toast')
+
+    for toast_element in toast_elements:
+        toast_text = toast_element.find_element(By.XPATH, './div/span').text.strip()
+        if toast_text:
+            tags.append(toast_text)
+
+    if not tags:
+        tags.append("N/A")
+
+    return {"Tags": tags}
 
 def scrape_key_features(driver):
     key_features = []
-    try:
-        # Main container for features
-        features_div_xpath = '//*[@id="maincontent"]/app-dynamic-page/app-pdp/section/div/div[1]/div[2]/div[3]/div[2]'
-        wait_for_element(driver, features_div_xpath)
-
-        # Now find all <li> elements under the <ul> list
-        feature_items_xpath = features_div_xpath + '/ul/li'
-        feature_elements = driver.find_elements(By.XPATH, feature_items_xpath)
+    # Main container for features
+    features_div_xpath = KEY_FEATURES_XPATH  # Already waited for with the product elements
 
-        for el in feature_elements:
-            text = el.text.strip()
-            if text:
-                key_features.append(text)
+    # Now find all <li> elements under the <ul> list
+    feature_items_xpath = features_div_xpath + '/ul/li'
+    feature_elements = driver.find_elements(By.XPATH, feature_items_xpath)
 
-        if not key_features:
-            key_features = ["N/A"]
+    for el in feature_elements:
+        text = el.text.strip()
+        if text:
+            key_features.append(text)
 
-        return json.dumps({"Key_Feature": key_features}, indent=4)
+    if not key_features:
+        key_features = ["N/A"]
 
-    except Exception as e:
-        print(f"❌ Exception while scraping key features: {e}")
-        return json.dumps({"Key_Feature": ["Error retrieving features"]}, indent=4)
+    return json.dumps({"Key_Feature": key_features}, indent=4)
 
 def scrape_faqs(driver):
+    # Scroll and wait for FAQ section
+    faq_section_xpath = '//*[@id="maincontent"]/app-dynamic-page/app-pdp/section[3]'
+    wait_until(driver, EC.presence_of_element_located((By.XPATH, faq_section_xpath)))
+    faq_heading = driver.find_element(By.XPATH, faq_section_xpath)
+    driver.execute_script("arguments[0].scrollIntoView(true);", faq_heading)
+
+    # Click and expand the collapsed accordion tabs (a retried stage must not collapse them again)
+    tabs_xpath = "//p-accordiontab//a"
+    wait_until(driver, EC.presence_of_element_located((By.XPATH, tabs_xpath)))
+    tabs = driver.find_elements(By.XPATH, tabs_xpath)
+    for tab in tabs:
+        expanded = tab.get_attribute("aria-expanded")
+        if expanded == "true":
+            continue
+        driver.execute_script("arguments[0].click();", tab)
+        try:
+            wait_until(driver, lambda d: tab.get_attribute("aria-expanded") != expanded, 3)
+        except Exception:
+            pass  # Tab without aria-expanded, the network idle wait below covers it
+    wait_for_network_idle(driver)
+
+    # Get page source and parse with BeautifulSoup
+    faqs = parse_faqs_html(driver.page_source)
+
+    if not faqs:
+        faqs.append({"Question": "N/A", "Answer": "No FAQs found"})
+
+    return {"FAQs": faqs}
+
+def parse_faqs_html(html):
+    soup = BeautifulSoup(html, 'html.parser')
     faqs = []
+
+    # Only capture the last section (actual FAQs)
+    all_sections = soup.find_all('p-accordiontab')
+    ignore_titles = {"Product Overview", "Specifications", "From Manufacturer"}
+    for tab in all_sections:
+        title = tab.find('span', class_='p-accordion-header-text')
+        answer_block = tab.find('div', {'role': 'region'})
+        if title and answer_block:
+            q = title.get_text(strip=True)
+            a = answer_block.get_text(strip=True)
+
+            if q not in ignore_titles:
+                faqs.append({"Question": q, "Answer": a})
+
+    return faqs
+
+
+# HTTP extraction: reads the server-rendered HTML (and its embedded JSON) without a browser
+http_session = requests.Session()
+http_session.headers.update({"User-Agent": USER_AGENT, "Accept-Language": "en-GB,en;q=0.9"})
+
+def node_text(node):
+    # Same whitespace handling as Selenium's .text
+    if isinstance(node, str):
+        return " ".join(node.split())
+    return " ".join(node.text_content().split())
+
+def first_text(tree, xpath):
+    nodes = tree.xpath(xpath)
+    return node_text(nodes[0]) if nodes else None
+
+def find_json_product(data):
+    # Walks a JSON document and returns the first object that looks like a product
+    if isinstance(data, dict):
+        keys = {str(key).lower() for key in data}
+        if "name" in keys and ("mpn" in keys or data.get("@type") == "Product"):
+            return data
+        values = data.values()
+    elif isinstance(data, list):
+        values = data
+    else:
+        return None
+
+    for value in values:
+        product = find_json_product(value)
+        if product:
+            return product
+    return None
+
+def get_embedded_product_json(tree):
+    """
+    Returns the product object from the page's JSON-LD or from Angular's transfer state
+    (the serverApp-state / ng-state script), or None when neither contains one.
+    """
+    for script in tree.xpath('//script[@type="application/ld+json"]'):
+        try:
+            product = find_json_product(json.loads(script.text_content()))
+        except ValueError:
+            continue
+        if product:
+            return product
+
+    for script in tree.xpath('//script[@id="serverApp-state" or @id="ng-state"]'):
+        state = script.text_content()
+        if state.startswith("{&q;"):  # Older Angular versions escape the transfer state
+            for escaped, char in (("&q;", '"'), ("&s;", "'"), ("&l;", "<"), ("&g;", ">"), ("&a;", "&")):
+                state = state.replace(escaped, char)
+        try:
+            product = find_json_product(json.loads(state))
+        except ValueError:
+            continue
+        if product:
+            return product
+
+    return None
+
+def format_json_price(value):
     try:
-        # Scroll and wait for FAQ section
-        faq_section_xpath = '//*[@id="maincontent"]/app-dynamic-page/app-pdp/section[3]'
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.XPATH, faq_section_xpath))
+        return f"£{float(str(value).replace('£', '').replace(',', '')):,.2f}"
+    except (TypeError, ValueError):
+        return None
+
+def parse_specifications_html(tree):
+    # Same structure as scrape_specifications, None when the spec content is not in the HTML
+    spec_divs = tree.xpath(SPEC_MAIN_DIV_XPATH)
+    if not spec_divs:
+        return None
+
+    specifications = {"MainHeader": first_text(tree, SPEC_MAIN_HEADER_XPATH) or "", "Specs": []}
+    tables = tree.xpath(SPEC_MAIN_DIV_XPATH + '/table')
+    headers = tree.xpath(SPEC_MAIN_DIV_XPATH + '/p')
+
+    for i, table in enumerate(tables):
+        title = node_text(headers[i]) if i < len(headers) else f"Table {i+1}"
+        table_data = []
+
+        for row in table.xpath('.//tr'):
+            columns = row.xpath('./td')
+            if len(columns) == 2:
+                key = node_text(columns[0])
+                value = node_text(columns[1])
+                if key and value:
+                    table_data.append({"Key": key, "Value": value})
+
+        if table_data:
+            specifications["Specs"].append({"Header": title, "Attributes": table_data})
+
+    if not specifications["Specs"]:
+        specifications["Specs"] = "No specifications found"
+
+    return json.dumps(specifications, indent=4)
+
+def parse_tags_html(tree):
+    tags = [node_text(span) for span in tree.xpath(TAGS_XPATH + '/div/app-product-toast/div/span')]
+    tags = [tag for tag in tags if tag]
+    return {"Tags": tags or ["N/A"]}
+
+def parse_key_features_html(tree):
+    if not tree.xpath(KEY_FEATURES_XPATH):
+        return None
+    key_features = [node_text(li) for li in tree.xpath(KEY_FEATURES_XPATH + '/ul/li')]
+    key_features = [text for text in key_features if text]
+    return json.dumps({"Key_Feature": key_features or ["N/A"]}, indent=4)
+
+def extract_price_block(tree, product_json):
+    # MPN, current price and list price from the page, with the embedded product JSON as fallback
+    product_mpn = first_text(tree, PRODUCT_MPN_XPATH)
+    product_mpn = clean_mpn(product_mpn) if product_mpn else product_json.get("mpn")
+
+    product_price = first_text(tree, PRODUCT_PRICE_XPATH)
+    if product_price:
+        product_price = clean_price(product_price)
+    else:
+        offers = product_json.get("offers") or {}
+        if isinstance(offers, list):
+            offers = offers[0] if offers else {}
+        product_price = format_json_price(offers.get("price", product_json.get("price")))
+
+    product_list_price = first_text(tree, PRODUCT_LIST_PRICE_XPATH)
+    if product_list_price:
+        product_list_price = clean_list_price(product_list_price)
+    return product_mpn, product_price, product_list_price
+
+def extract_product_from_html(html, product_link, stages=None):
+    """
+    Builds the same record as scrape_product_page from a page's HTML, with the same placeholders
+    for a missing list price, key features or specifications. Fields of stages that were not
+    requested are NOT_COLLECTED. Returns the record, the list of image URLs found and the
+    HTTP_REQUIRED_FIELDS that are not in the HTML.
+    """
+    stages = STAGES if stages is None else stages
+    tree = lxml_html.fromstring(html)
+    product_json = get_embedded_product_json(tree) or {}
+
+    product_name = first_text(tree, PRODUCT_NAME_XPATH) or product_json.get("name")
+
+    product_mpn, product_price, product_list_price = extract_price_block(tree, product_json)
+
+    sub_category = child_category = grand_child_categories = None
+    if "breadcrumbs" in stages:
+        sub_category, child_category, grand_child_categories = split_breadcrumbs(
+            [node_text(a) for a in tree.xpath(BREADCRUMB_LINKS_XPATH)]
         )
-        faq_heading = driver.find_element(By.XPATH, faq_section_xpath)
-        driver.execute_script("arguments[0].scrollIntoView(true);", faq_heading)
-        time.sleep(3)
-
-        # Click and expand all accordion tabs
-        tabs_xpath = "//p-accordiontab//a"
-        tabs = driver.find_elements(By.XPATH, tabs_xpath)
-        for tab in tabs:
-            driver.execute_script("arguments[0].click();", tab)
-            time.sleep(2)
-
-        # Get page source and parse with BeautifulSoup
-        html = driver.page_source
-        soup = BeautifulSoup(html, 'html.parser')
-
-        # Only capture the last section (actual FAQs)
-        all_sections = soup.find_all('p-accordiontab')
-        ignore_titles = {"Product Overview", "Specifications", "From Manufacturer"}
-        for tab in all_sections:
-            title = tab.find('span', class_='p-accordion-header-text')
-            answer_block = tab.find('div', {'role': 'region'})
-            if title and answer_block:
-                q = title.get_text(strip=True)
-                a = answer_block.get_text(strip=True)
-
-                if q not in ignore_titles:
-                    faqs.append({"Question": q, "Answer": a})
 
+    image_urls = []
+    for idx in range(4 if "images" in stages else 0):
+        sources = tree.xpath(f"{IMAGE_BASE_XPATH}[{idx+1}]/img/@src")
+        image_urls.append(sources[0] if sources else None)
+
+    faqs = None
+    if "faqs" in stages:
+        faqs = parse_faqs_html(html)
         if not faqs:
             faqs.append({"Question": "N/A", "Answer": "No FAQs found"})
 
-        return {"FAQs": faqs}
-
+    record = {
+        "Link": product_link,
+        'Product Name': product_name,
+        'Product MPN': product_mpn,
+        'Product Current Price': product_price,
+        'Product List Price': product_list_price,
+        'Sub Category': sub_category,
+        'Child Category': child_category,
+        'Grand Child Categories': grand_child_categories,
+        'Thumbnail_Image': None,
+        'Additional_Image_1': None,
+        'Additional_Image_2': None,
+        'Additional_Image_3': None,
+        'Tags': json.dumps(parse_tags_html(tree)) if "tags" in stages else None,
+        'Key_Features': parse_key_features_html(tree) if "key_features" in stages else None,
+        'Specifications': parse_specifications_html(tree) if "specifications" in stages else None,
+        'FAQs': {"FAQs": faqs}
+    }
+    record = mark_not_collected(record, stages)
+    missing = [field for field in HTTP_REQUIRED_FIELDS if not record.get(field)]
+
+    # Placeholders, set after the missing check so specifications absent from the HTML still count as missing
+    if record['Product List Price'] is None:
+        record['Product List Price'] = ""
+    if record['Key_Features'] is None:
+        record['Key_Features'] = json.dumps({"Key_Feature": ["N/A"]}, indent=4)
+    if record['Specifications'] is None:
+        record['Specifications'] = json.dumps({"Specs": "No specifications found"}, indent=4)
+    record[STAGE_STATUS_FIELD] = get_stage_statuses(record, stages)
+    return record, image_urls, missing
+
+def scrape_product_http(product_link, fingerprint=None, stages=None):
+    """
+    Fetches the product page over plain HTTP and extracts it without a browser.
+    Returns the record (or None when the fetch failed), the image URLs, the list of
+    HTTP_REQUIRED_FIELDS that are missing and the response's ETag/Last-Modified validators.
+    With a stored fingerprint the request is conditional and a 304 returns NOT_MODIFIED.
+    """
+    try:
+        response = throttled_get(http_session, product_link, headers=conditional_headers(fingerprint), timeout=HTTP_TIMEOUT)
+        validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+        if response.status_code == 304:
+            return NOT_MODIFIED, [], [], validators
+        response.raise_for_status()
+        if "charset" not in response.headers.get("Content-Type", "").lower():
+            response.encoding = "utf-8"  # requests would fall back to ISO-8859-1 and garble "£"
+        record, image_urls, missing = extract_product_from_html(response.text, product_link, stages)
     except Exception as e:
-        logger.error(f"Error locating FAQ section: {e}")
-        return {"FAQs": [{"Question": "N/A", "Answer": "FAQ section not found"}]}
-
-def validate_product_link(product_link):
+        logger.warning(f"⚠️ HTTP extraction failed for {product_link}: {e}")
+        if isinstance(e, requests.Timeout):
+            record_concurrency_timeout()
+        return None, [], list(HTTP_REQUIRED_FIELDS), {}
+
+    return record, image_urls, missing, validators
+
+def download_record_images(record, image_urls):
+    image_fields = ['Thumbnail_Image', 'Additional_Image_1', 'Additional_Image_2', 'Additional_Image_3']
+    for idx, (field, image_url) in enumerate(zip(image_fields, image_urls)):
+        if image_url:
+            record[field] = download_image(image_url, record['Product MPN'], None if idx == 0 else idx, "price")
+    if "images" in record.get(STAGE_STATUS_FIELD, {}):
+        record[STAGE_STATUS_FIELD]["images"] = "empty" if is_stage_empty("images", record) else "ok"
+
+# Clicks every collapsed accordion tab (Specifications and FAQs) in one WebDriver call
+EXPAND_ACCORDIONS_SCRIPT = """
+const tabs = document.querySelectorAll("p-accordiontab a");
+let clicked = 0;
+tabs.forEach(tab => {
+    if (tab.getAttribute("aria-expanded") !== "true") {
+        tab.click();
+        clicked++;
+    }
+});
+return clicked;
+"""
+
+# True once every accordion tab is expanded and its panel (div[role=region]) has been rendered
+ACCORDION_PANELS_SCRIPT = """
+const tabs = Array.from(document.querySelectorAll("p-accordiontab"));
+return tabs.length > 0 && tabs.every(tab => {
+    const header = tab.querySelector("a");
+    return (!header || header.getAttribute("aria-expanded") !== "false") && !!tab.querySelector("div[role=region]");
+});
+"""
+
+def expand_accordions(driver, stages):
     """
-    This method checks whether the given product link contains a valid 'Product Overview' section
-    and returns a boolean indicating whether the link is a valid product page or not.
+    Expands the accordion tabs and waits for the content of the requested accordion stages
+    (the specification table, the FAQ panels). Returns the stages whose content did not load in time.
     """
-    options = get_chrome_options()
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=options)
-    wait = WebDriverWait(driver, 20)  # Increased wait time
+    timed_out = set()
+    if not stages & {"specifications", "faqs"}:
+        return timed_out
+    expanded = driver.execute_script(EXPAND_ACCORDIONS_SCRIPT)
+    logger.info(f"Expanded {expanded} accordion tab(s)")
+    conditions = {
+        "specifications": EC.presence_of_element_located((By.XPATH, SPEC_MAIN_DIV_XPATH)),
+        "faqs": lambda d: d.execute_script(ACCORDION_PANELS_SCRIPT),
+    }
+    for stage, condition in conditions.items():
+        if stage in stages:
+            try:
+                wait_until(driver, condition)
+            except Exception as e:
+                timed_out.add(stage)
+                logger.warning(f"⚠️ Accordion content for {stage} did not load: {e}")
+    return timed_out
 
+def scrape_page_snapshot(driver, product_link, stages=None):
+    """
+    Extracts the product from one snapshot of the loaded page instead of one WebDriver call
+    per table, row, cell and tag. Raises when a core field is missing so the page is retried
+    like in the element by element mode.
+    """
+    stages = STAGES if stages is None else stages
+    timed_out = expand_accordions(driver, stages)
+
+    record, image_urls, _ = extract_product_from_html(driver.page_source, product_link, stages)
+    missing = [field for field in ('Product Name', 'Product MPN', 'Product Current Price') if not record.get(field)]
+    if missing:
+        raise ValueError(f"Missing {missing} in page snapshot")
+
+    # Accordion stages that timed out or failed are retried on the open page, keeping the rest; an empty
+    # stage whose content did load (a product without FAQs or specifications) is an answer and is not retried
+    statuses = record[STAGE_STATUS_FIELD]
+    for stage in timed_out:
+        if statuses.get(stage) == "empty":
+            statuses[stage] = "timeout"
+    for attempt in range(2, STAGE_ATTEMPTS + 1):
+        retry_stages = [stage for stage in ("specifications", "faqs") if statuses.get(stage) in ("timeout", "error")]
+        if not retry_stages:
+            break
+        logger.info(f"🔁 Retrying stage(s) {retry_stages} on the open page")
+        timed_out = expand_accordions(driver, frozenset(retry_stages))
+        wait_for_network_idle(driver)
+        partial, _, _ = extract_product_from_html(driver.page_source, product_link, frozenset(retry_stages))
+        for stage in retry_stages:
+            status = partial[STAGE_STATUS_FIELD][stage]
+            if status == "ok" or stage not in timed_out:
+                record.update({field: partial[field] for field in STAGE_FIELDS[stage]})
+                statuses[stage] = status
+    for stage, status in statuses.items():
+        if status in ("timeout", "error"):
+            record.update(STAGE_FALLBACKS[stage])  # Same placeholder as a stage run_stages gave up on
+
+    download_record_images(record, image_urls)
+    return record
+
+# Price-only refresh (--mode price): only the price block and the tags are read, without scrolling,
+# popups, accordions or images, and the results update an existing output file by MPN (--update).
+MODE = "full"
+OUTPUT_PREFIX = "scraped_product_data"
+PRICE_FIELDS = ['Product Current Price', 'Product List Price', 'Tags']
+
+def extract_prices_from_html(html, product_link):
+    tree = lxml_html.fromstring(html)
+    product_mpn, product_price, product_list_price = extract_price_block(tree, get_embedded_product_json(tree) or {})
+    return {
+        "Link": product_link,
+        'Product MPN': product_mpn,
+        'Product Current Price': product_price,
+        'Product List Price': product_list_price or "",
+        'Tags': json.dumps(parse_tags_html(tree))
+    }
+
+def scrape_price_http(product_link):
+    # Returns the price record, or None when the fetch failed or the MPN or price is not in the HTML
     try:
-        driver.get(product_link)
-        handle_cookie_popup(driver)      # Existing cookie handler
-        handle_newsletter_popup(driver)
-        print(f"Visiting: {product_link}")
+        response = throttled_get(http_session, product_link, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        if "charset" not in response.headers.get("Content-Type", "").lower():
+            response.encoding = "utf-8"
+        record = extract_prices_from_html(response.text, product_link)
+    except Exception as e:
+        logger.warning(f"⚠️ HTTP price extraction failed for {product_link}: {e}")
+        return None
+    if not record['Product MPN'] or not record['Product Current Price']:
+        return None
+    return record
 
-        # Wait for main content to load
-        try:
-            wait_for_element(driver, '//*[@id="maincontent"]/app-dynamic-page')
-            print("✅ Main content loaded")
-        except Exception as e:
-            print(f"❌ Main content failed to load: {e}")
-            return False
+def scrape_price_page(product_link):
+    # Browser fallback for price mode: no scrolling, popup handling, accordions or image waits
+    driver = get_driver()
+    crashed = False
 
-        # Check for "Product Overview" text (flexible XPath)
-        product_overview_xpath = '//*[contains(text(), "Product Overview")]'
-        try:
-            wait_for_element(driver, product_overview_xpath)
-            print("✅ Product Overview found!")
-            return True
-        except Exception as e:
-            print(f"❌ Product Overview section not found: {e}")
-            return False  # Product Overview section not found
+    try:
+        blocked = use_blocking_for_next_page()
+        apply_resource_blocking(driver, blocked and BLOCK_MODE == "blocklist")
+        acquire_host_token(product_link)
+        load_start = time.time()
+        driver.get(product_link)
+        check_bot_block(driver, product_link)
+        valid = validate_product_link(driver)
+        if valid is None:
+            logger.warning(f"⚠️ Page did not load, not marking it invalid: {product_link}")
+            record_proxy_result(driver.proxy, False)  # A dead or blocking proxy shows up as a Chrome error page
+            return None  # Retried by scrape_with_retries, recorded as failed if it never loads
+        if not valid:
+            logger.warning(f"❌ Not a product page: {product_link}")
+            return INVALID_PAGE
+
+        wait_for_elements(
+            driver,
+            required=[PRODUCT_MPN_XPATH, PRODUCT_PRICE_XPATH],
+            optional=[PRODUCT_LIST_PRICE_XPATH, TAGS_XPATH],
+        )
+        record_proxy_result(driver.proxy, True, time.time() - load_start)
+        record = extract_prices_from_html(driver.page_source, product_link)
+        if not record['Product MPN'] or not record['Product Current Price']:
+            raise ValueError("Missing MPN or price in page snapshot")
+        return record
 
     except Exception as e:
-        print(f"❌ Error: {e}")
-        return False
+        logger.error(f"❌ Error scraping prices from {product_link}: {e}")
+        if isinstance(e, TimeoutException):
+            record_proxy_result(driver.proxy, False)
+        crashed = not is_driver_alive(driver)
+        return None
     finally:
-        driver.quit()
+        release_driver(driver, crashed)
+
+def scrape_price(product_link):
+    if ENGINE != "browser":
+        record = scrape_price_http(product_link)
+        if record:
+            logger.info(f"🌐 Prices extracted over HTTP: {product_link}")
+            return record
+        if ENGINE == "http":
+            return None
+        logger.info(f"🔄 Falling back to Chrome for the prices of {product_link}")
+    return scrape_with_retries(product_link)
+
+def update_prices(base_filename, prices_filename):
+    """
+    Writes the prices and tags of a price-mode output into an existing JSONL output file,
+    matching records by MPN. The base file is rewritten line by line and replaced at the end.
+    """
+    prices = {}
+    for record in iter_jsonl_records(prices_filename):
+        if record.get('Product MPN'):
+            prices[record['Product MPN']] = {field: record.get(field) for field in PRICE_FIELDS}
+
+    updated = 0
+    seen = set()
+    temp_filename = base_filename + ".tmp"
+    with open(temp_filename, "w", encoding="utf-8") as out:
+        for record in iter_jsonl_records(base_filename):
+            mpn = record.get('Product MPN')
+            if mpn in prices:
+                record.update(prices[mpn])
+                seen.add(mpn)
+                updated += 1
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    os.replace(temp_filename, base_filename)
+
+    unmatched = len(prices) - len(seen)
+    logger.info(f"💷 Updated prices of {updated} record(s) in {base_filename}, {unmatched} MPN(s) not found")
+    print(f"💷 Updated prices of {updated} record(s) in {base_filename}, {unmatched} MPN(s) not found")
+
+def scrape_product(product_link, stages=None):
+    """
+    Scrapes one product link with the configured ENGINE: the HTTP extraction runs first and
+    Chrome is only launched when one of HTTP_REQUIRED_FIELDS is missing from the HTML.
+    stages limits the optional field groups (STAGE_FIELDS) to extract, default STAGES.
+    When the link has a stored fingerprint and the page did not change, the previous record
+    is returned without extracting images or starting Chrome.
+    """
+    if MODE == "price":
+        return scrape_price(product_link)
+
+    fingerprint = load_fingerprint(product_link) if CHANGE_DETECTION else None
+    validators = {}
+    if ENGINE != "browser" or fingerprint:
+        record, image_urls, missing, validators = scrape_product_http(product_link, fingerprint, stages)
+        if record == NOT_MODIFIED or (fingerprint and record and not missing
+                                      and record_payload_hash(record) == fingerprint["payload_hash"]):
+            return carry_forward_record(product_link, fingerprint, validators)
+
+    if ENGINE != "browser":
+        if record and not missing:
+            logger.info(f"🌐 Extracted over HTTP: {product_link}")
+            download_record_images(record, image_urls)
+            return save_fingerprint(product_link, record, fingerprint, validators)
+
+        if ENGINE == "http":
+            if record and record.get('Product MPN'):
+                logger.warning(f"⚠️ HTTP extraction incomplete for {product_link}, missing: {missing}")
+                download_record_images(record, image_urls)
+                return save_fingerprint(product_link, record, fingerprint, validators)
+            return None
+
+        logger.info(f"🔄 Falling back to Chrome for {product_link}, missing: {missing}")
+
+    record = scrape_with_retries(product_link, stages)
+    if record and record != INVALID_PAGE:
+        save_fingerprint(product_link, record, fingerprint, validators)
+    return record
+
+def validate_product_link(driver):
+    """
+    This method checks whether the page already loaded in the driver contains a valid 'Product Overview'
+    section. Returns True for a product page and False when the main content loaded without that
+    section. Returns None when the main content did not load at all (timeout, slow or blocked load),
+    which says nothing about the link and must not mark it invalid.
+    It runs straight after navigation, so non-product pages are dropped before any scrolling,
+    popup handling or image waits.
+    """
+    # Wait for main content to load
+    try:
+        wait_until(driver, EC.presence_of_element_located((By.XPATH, '//*[@id="maincontent"]/app-dynamic-page')),
+                   PRODUCT_CHECK_TIMEOUT)
+        print("✅ Main content loaded")
+    except Exception as e:
+        print(f"❌ Main content failed to load: {e}")
+        return None
+
+    # Check for "Product Overview" text (flexible XPath)
+    product_overview_xpath = '//*[contains(text(), "Product Overview")]'
+    try:
+        wait_until(driver, EC.presence_of_element_located((By.XPATH, product_overview_xpath)), PRODUCT_CHECK_TIMEOUT)
+        print("✅ Product Overview found!")
+        return True
+    except Exception as e:
+        print(f"❌ Product Overview section not found: {e}")
+        return False  # Product Overview section not found
+
+
+
+# Streaming output: every record is appended to a JSONL file as soon as it is scraped, so memory stays
+# flat and a crash keeps everything written so far. Excel is an optional export at the end (--excel).
+output_files = {"records": None, "failed": None}
+
+def open_output_files(records_filename, failed_filename, append=True):
+    mode = "a" if append else "w"
+    output_files["records"] = open(records_filename, mode, encoding="utf-8")
+    output_files["failed"] = open(failed_filename, mode, encoding="utf-8")
+
+def close_output_files():
+    for name, f in output_files.items():
+        if f:
+            f.close()
+            output_files[name] = None
+
+def write_record(record):
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with lock:
+        output_files["records"].write(line + "\n")
+        output_files["records"].flush()
+
+def write_failed_link(link):
+    with lock:
+        output_files["failed"].write(f"{link}\n")
+        output_files["failed"].flush()
+
+# Durable job store: the state of every link (pending, in_progress, done, failed, invalid) with its
+# attempt count and timestamps, updated in SQLite as work completes. --resume skips finished links.
+JOB_DB = "scrape_jobs.db"
+JOB_LEASE_SECONDS = 15 * 60  # An in_progress link whose lease ran out is picked up again
+MAX_JOB_ATTEMPTS = 3  # Failed links are retried on resumed runs until they reach this many attempts
+JOB_BATCH_SIZE = 500
+job_db = None
+job_db_lock = threading.Lock()
+
+def open_job_db(filename):
+    global job_db
+    job_db = sqlite3.connect(filename, timeout=30, check_same_thread=False)
+    job_db.execute("PRAGMA journal_mode=WAL")  # Shard processes can share the file
+    job_db.execute("PRAGMA synchronous=NORMAL")
+    job_db.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            url TEXT PRIMARY KEY,
+            state TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            lease_until REAL,
+            last_error TEXT
+        )
+    """)
+    job_db.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state)")
+    job_db.execute("""
+        CREATE TABLE IF NOT EXISTS fingerprints (
+            url_key TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            payload_hash TEXT NOT NULL,
+            record TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+    """)
+    job_db.execute("""
+        CREATE TABLE IF NOT EXISTS manifest (
+            url_key TEXT PRIMARY KEY,
+            state TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+    """)
+    with job_db:
+        expired = job_db.execute(
+            "UPDATE jobs SET state = 'pending', lease_until = NULL WHERE state = 'in_progress' AND lease_until < ?",
+            (time.time(),),
+        ).rowcount
+    if expired:
+        logger.info(f"♻️ {expired} expired in-progress job lease(s) returned to pending")
+
+def close_job_db():
+    global job_db
+    if job_db:
+        job_db.close()
+        job_db = None
+
+def iter_unfinished_links(links, resume=False):
+    """
+    Registers the input links in the job store in batches and yields the ones that still need
+    work. Without resume every link is reset to pending and yielded. With resume, links that
+    are done or invalid, failed MAX_JOB_ATTEMPTS times or leased by a live worker are skipped.
+    """
+    skipped = 0
+    batch = []
+
+    def flush(batch):
+        nonlocal skipped
+        now = time.time()
+        with job_db_lock, job_db:
+            if resume:
+                job_db.executemany(
+                    "INSERT OR IGNORE INTO jobs (url, state, created_at, updated_at) VALUES (?, 'pending', ?, ?)",
+                    [(url, now, now) for url in batch],
+                )
+            else:
+                job_db.executemany(
+                    "INSERT INTO jobs (url, state, created_at, updated_at) VALUES (?, 'pending', ?, ?) "
+                    "ON CONFLICT (url) DO UPDATE SET state = 'pending', attempts = 0, lease_until = NULL, "
+                    "last_error = NULL, updated_at = excluded.updated_at",
+                    [(url, now, now) for url in batch],
+                )
+            placeholders = ",".join("?" * len(batch))
+            rows = job_db.execute(
+                f"SELECT url, state, attempts, lease_until FROM jobs WHERE url IN ({placeholders})", batch
+            ).fetchall()
+
+        states = {url: (state, attempts, lease_until) for url, state, attempts, lease_until in rows}
+        for url in batch:
+            state, attempts, lease_until = states[url]
+            if state == "pending" or (state == "failed" and attempts < MAX_JOB_ATTEMPTS) \
+                    or (state == "in_progress" and (lease_until or 0) < now):
+                yield url
+            else:
+                skipped += 1
+
+    for link in links:
+        if not isinstance(link, str) or not link.strip():
+            continue
+        batch.append(link.strip())
+        if len(batch) >= JOB_BATCH_SIZE:
+            yield from flush(batch)
+            batch = []
+    if batch:
+        yield from flush(batch)
+
+    if skipped:
+        logger.info(f"⏭️ {skipped} link(s) skipped, already finished in {JOB_DB}")
+        print(f"⏭️ {skipped} link(s) skipped, already finished in {JOB_DB}")
+
+def claim_job(url):
+    # Atomically moves a link to in_progress, False when someone else holds it or it is finished
+    now = time.time()
+    with job_db_lock, job_db:
+        claimed = job_db.execute(
+            "UPDATE jobs SET state = 'in_progress', attempts = attempts + 1, lease_until = ?, updated_at = ? "
+            "WHERE url = ? AND (state IN ('pending', 'failed') OR (state = 'in_progress' AND lease_until < ?))",
+            (now + JOB_LEASE_SECONDS, now, url, now),
+        ).rowcount
+    return claimed == 1
+
+def finish_job(url, state, error=None):
+    now = time.time()
+    with job_db_lock, job_db:
+        job_db.execute(
+            "UPDATE jobs SET state = ?, lease_until = NULL, updated_at = ?, last_error = ? WHERE url = ?",
+            (state, now, error, url),
+        )
+        if state == "done" and STAGES != ALL_STAGES:
+            return  # A partial record must not stop a later full run from scraping the link
+        job_db.execute(
+            "INSERT INTO manifest (url_key, state, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (url_key) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+            (canonicalize_url(url), state, now),
+        )
 
 
+# Skip-list manifest: every processed URL in canonical form with its state, in an indexed table of the
+# job store. Input links are checked against it in batches before they reach the queue, so links that
+# are done or invalid never start a browser. MANIFEST_TTL gives the seconds a state stays valid
+# (None: forever, 0: never skipped), override with --ttl done=7d,invalid=30d.
+MANIFEST_TTL = {"done": None, "invalid": 30 * 24 * 3600, "failed": 0}
+TRACKING_PARAMS = {"gclid", "gclsrc", "dclid", "fbclid", "msclkid", "mc_cid", "mc_eid", "_ga", "_gl", "ref", "srsltid"}
+
+def canonicalize_url(url):
+    """
+    Canonical form used as the manifest key: lowercase scheme and host, no trailing slash,
+    no fragment, tracking parameters (utm_* and TRACKING_PARAMS) removed, other parameters sorted.
+    """
+    parts = urlsplit(str(url).strip())
+    path = parts.path.rstrip("/") or "/"
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+             if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS]
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(sorted(query)), ""))
+
+def parse_ttl(value):
+    # "done=7d,invalid=30d,failed=0" -> {"done": 604800, ...}, "forever" keeps a state skipped for good
+    units = {"s": 1, "m": 60, "h": 3600, "d": 24 * 3600}
+    ttl = dict(MANIFEST_TTL)
+    for item in filter(None, value.split(",")):
+        state, _, duration = item.partition("=")
+        duration = duration.strip().lower()
+        if duration == "forever":
+            ttl[state.strip()] = None
+        elif duration[-1:] in units:
+            ttl[state.strip()] = float(duration[:-1]) * units[duration[-1]]
+        else:
+            ttl[state.strip()] = float(duration)
+    return ttl
+
+def skip_processed_links(links):
+    """
+    Yields the input links whose canonical URL is not in the manifest with a state that is
+    still within its MANIFEST_TTL. Lookups go to the primary key index, one query per batch.
+    """
+    skipped = 0
+
+    def check(batch):
+        nonlocal skipped
+        keys = {link: canonicalize_url(link) for link in batch}
+        unique_keys = list(set(keys.values()))
+        placeholders = ",".join("?" * len(unique_keys))
+        with job_db_lock:
+            rows = job_db.execute(
+                f"SELECT url_key, state, updated_at FROM manifest WHERE url_key IN ({placeholders})", unique_keys
+            ).fetchall()
+        processed = {url_key: (state, updated_at) for url_key, state, updated_at in rows}
+
+        now = time.time()
+        for link in batch:
+            state, updated_at = processed.get(keys[link], (None, None))
+            if state in MANIFEST_TTL:
+                ttl = MANIFEST_TTL[state]
+                if ttl is None or now - updated_at < ttl:
+                    skipped += 1
+                    continue
+            yield link
+
+    batch = []
+    for link in links:
+        if not isinstance(link, str) or not link.strip():
+            continue
+        batch.append(link.strip())
+        if len(batch) >= JOB_BATCH_SIZE:
+            yield from check(batch)
+            batch = []
+    if batch:
+        yield from check(batch)
+
+    if skipped:
+        logger.info(f"⏭️ {skipped} link(s) skipped by the manifest (already processed)")
+        print(f"⏭️ {skipped} link(s) skipped by the manifest (already processed)")
+
+# Change detection: per canonical URL the page's ETag/Last-Modified and a hash of the product data are
+# kept with the last record. Links that reach the scraper again (--rescrape, an expired --ttl or a
+# fresh job store) get a conditional HTTP fetch first, and an unchanged page carries the previous
+# record forward instead of going through the browser and image downloads again.
+CHANGE_DETECTION = True
+NOT_MODIFIED = "NOT_MODIFIED"  # Returned by scrape_product_http on a 304 response
+NON_PAYLOAD_FIELDS = {"Link", "Stage_Status", "Thumbnail_Image", "Additional_Image_1", "Additional_Image_2", "Additional_Image_3"}
+change_lock = threading.Lock()
+change_stats = {"new": 0, "changed": 0, "unchanged": 0, "carried_forward": 0}
+
+def record_change(status):
+    with change_lock:
+        change_stats[status] += 1
+
+def record_payload_hash(record):
+    # Hash of the product data only: the link and the local image file names do not count as a change
+    payload = {field: value if value is not None else "" for field, value in record.items()
+               if field not in NON_PAYLOAD_FIELDS}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+def conditional_headers(fingerprint):
+    headers = {}
+    if fingerprint and fingerprint["etag"]:
+        headers["If-None-Match"] = fingerprint["etag"]
+    if fingerprint and fingerprint["last_modified"]:
+        headers["If-Modified-Since"] = fingerprint["last_modified"]
+    return headers
+
+def load_fingerprint(url):
+    with job_db_lock:
+        row = job_db.execute(
+            "SELECT etag, last_modified, payload_hash, record FROM fingerprints WHERE url_key = ?",
+            (canonicalize_url(url),),
+        ).fetchone()
+    if not row:
+        return None
+    etag, last_modified, payload_hash, record = row
+    return {"etag": etag, "last_modified": last_modified, "payload_hash": payload_hash, "record": record}
 
-# Data list to store all scraped product data
-scraped_data = []
-failed_links = []
+def save_fingerprint(url, record, fingerprint=None, validators=None):
+    """
+    Stores the record with its payload hash and HTTP validators, counts the link as new,
+    changed or unchanged against the previous fingerprint and returns the record.
+    """
+    if not CHANGE_DETECTION:
+        return record
+    validators = validators or {}
+    payload_hash = record_payload_hash(record)
+    if not fingerprint:
+        record_change("new")
+    elif fingerprint["payload_hash"] != payload_hash:
+        record_change("changed")
+    else:
+        record_change("unchanged")
+
+    with job_db_lock, job_db:
+        job_db.execute(
+            "INSERT INTO fingerprints (url_key, etag, last_modified, payload_hash, record, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (url_key) DO UPDATE SET etag = excluded.etag, "
+            "last_modified = excluded.last_modified, payload_hash = excluded.payload_hash, "
+            "record = excluded.record, updated_at = excluded.updated_at",
+            (canonicalize_url(url), validators.get("etag"), validators.get("last_modified"),
+             payload_hash, json.dumps(record, ensure_ascii=False), time.time()),
+        )
+    return record
+
+def carry_forward_record(url, fingerprint, validators):
+    # The page did not change: reuse the stored record and refresh the validators if the server sent new ones
+    record = json.loads(fingerprint["record"])
+    record["Link"] = url
+    for field in STAGE_FIELDS["images"]:
+        if record.get(field) and not os.path.exists(os.path.join(IMAGE_FOLDER, record[field])):
+            record[field] = None  # Its download failed in the run that stored the record
+    record_change("unchanged")
+    record_change("carried_forward")
+    with job_db_lock, job_db:
+        job_db.execute(
+            "UPDATE fingerprints SET etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified), "
+            "updated_at = ? WHERE url_key = ?",
+            (validators.get("etag"), validators.get("last_modified"), time.time(), canonicalize_url(url)),
+        )
+    logger.info(f"♻️ Unchanged, previous record carried forward: {url}")
+    return record
+
+def log_change_summary():
+    if not CHANGE_DETECTION:
+        return
+    with change_lock:
+        stats = dict(change_stats)
+    summary = (f"🔎 Change detection: {stats['new']} new, {stats['changed']} changed, {stats['unchanged']} unchanged "
+               f"({stats['carried_forward']} carried forward without re-scraping)")
+    logger.info(summary)
+    print(summary)
+
+def iter_jsonl_records(filename):
+    with open(filename, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def excel_cell(value):
+    # Lists and dicts are written as text, like DataFrame.to_excel did
+    if isinstance(value, (list, dict)):
+        return str(value)
+    return value
+
+def export_to_excel(jsonl_filename, excel_filename=None):
+    """
+    Exports a JSONL output file to Excel with openpyxl's write-only mode, reading the file
+    twice (columns first, then rows) so memory does not grow with the number of records.
+    """
+    excel_filename = excel_filename or os.path.splitext(jsonl_filename)[0] + ".xlsx"
+
+    columns = []
+    for record in iter_jsonl_records(jsonl_filename):
+        for key in record:
+            if key not in columns:
+                columns.append(key)
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(columns)
+    for record in iter_jsonl_records(jsonl_filename):
+        sheet.append([excel_cell(record.get(column)) for column in columns])
+    workbook.save(excel_filename)
+
+    logger.info(f"✅ Exported {jsonl_filename} to {excel_filename}")
+    print(f"✅ Exported {jsonl_filename} to {excel_filename}")
+    return excel_filename
+
+
+# Streaming input: links are read lazily from the input and go straight to the work queue, so scraping
+# starts right away and memory does not grow with the input size. Excel and CSV inputs use the
+# INPUT_COLUMN column (or the first column), text files one link per line, sitemaps their <loc> entries.
+INPUT_COLUMN = "Links"
+
+def find_input_column(header):
+    # Index of INPUT_COLUMN in the header row, and whether the row was a header at all
+    header = [str(cell).strip() if cell is not None else "" for cell in header]
+    if INPUT_COLUMN in header:
+        return header.index(INPUT_COLUMN), True
+    return 0, not (header and header[0].startswith("http"))
+
+def iter_excel_links(filename):
+    workbook = load_workbook(filename, read_only=True)  # Rows are read from the file as they are iterated
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, ())
+        column, is_header = find_input_column(header)
+        if not is_header:
+            yield header[column]
+        for row in rows:
+            if column < len(row):
+                yield row[column]
+    finally:
+        workbook.close()
+
+def iter_csv_links(filename):
+    with open(filename, newline="", encoding="utf-8-sig") as f:
+        rows = csv.reader(f)
+        header = next(rows, [])
+        column, is_header = find_input_column(header)
+        if not is_header:
+            yield header[column]
+        for row in rows:
+            if column < len(row):
+                yield row[column]
+
+def iter_text_links(filename):
+    with open(filename, encoding="utf-8-sig") as f:
+        for line in f:
+            if not line.lstrip().startswith("#"):
+                yield line
+
+def open_sitemap(source):
+    if source.startswith(("http://", "https://")):
+        response = throttled_get(http_session, source, stream=True, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        response.raw.decode_content = True
+        stream = response.raw
+    else:
+        stream = open(source, "rb")
+    if source.endswith(".gz"):
+        return gzip.GzipFile(fileobj=stream)
+    return stream
+
+def iter_sitemap_links(source):
+    """
+    Yields the page URLs of a sitemap file or URL with iterparse, clearing every entry once it
+    is read so memory stays flat. The child sitemaps of a sitemap index are read in turn.
+    """
+    with open_sitemap(source) as stream:
+        for _, element in etree.iterparse(stream, events=("end",)):
+            tag = etree.QName(element).localname
+            if tag not in ("url", "sitemap"):
+                continue
+            location = (element.findtext("{*}loc") or "").strip()
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+            if tag == "sitemap" and location:
+                logger.info(f"🗺️ Reading child sitemap {location}")
+                yield from iter_sitemap_links(location)
+            elif location:
+                yield location
+
+def iter_input_links(source):
+    # Picks the reader from the input's extension, any value that is not a non-empty string is dropped
+    name = source.lower()
+    if name.endswith((".xml", ".xml.gz")) or name.startswith(("http://", "https://")):
+        links = iter_sitemap_links(source)
+    elif name.endswith(".csv"):
+        links = iter_csv_links(source)
+    elif name.endswith(".txt"):
+        links = iter_text_links(source)
+    else:
+        links = iter_excel_links(source)
+    for link in links:
+        if isinstance(link, str) and link.strip():
+            yield link.strip()
+
+# Discovery: category and listing pages (--crawl) are fetched over HTTP by CRAWL_WORKERS threads, every
+# pagination link found is queued once, and the product links are deduplicated by canonical URL and
+# streamed into the scrape queue while the rest of the listing is still being crawled.
+CRAWL_WORKERS = 4
+CRAWL_MAX_PAGES = 1000  # Safety limit on listing pages per run
+CRAWL_BATCH_SIZE = 20  # Job store batch size while crawling, so scraping starts after the first listing page
+LISTING_PRODUCT_LINK_XPATH = '//*[@id="maincontent"]//app-product-card//a/@href'
+LISTING_PAGINATION_XPATH = '//a[@rel="next"]/@href | //link[@rel="next"]/@href | //*[contains(@class, "pagination")]//a/@href'
+
+def parse_listing_page(html, page_url):
+    # Product links and pagination links of one listing page, as absolute URLs
+    tree = lxml_html.fromstring(html)
+    tree.make_links_absolute(page_url)
+    product_links = [str(href).strip() for href in tree.xpath(LISTING_PRODUCT_LINK_XPATH)]
+    page_links = [str(href).strip() for href in tree.xpath(LISTING_PAGINATION_XPATH)]
+    return product_links, page_links
+
+def crawl_categories(category_urls):
+    """
+    Walks the given category pages and their pagination concurrently and yields every product
+    link once, as soon as its listing page has been parsed. Pagination links are only followed
+    on the category's own host.
+    """
+    page_queue = queue.Queue()
+    found_queue = queue.Queue(maxsize=LINK_QUEUE_SIZE * 10)
+    seen_pages = set()
+    seen_links = set()
+    seen_lock = threading.Lock()
+    stats = {"pages": 0, "links": 0, "duplicates": 0}
+    done = object()
+
+    def add_page(page_url, host):
+        key = canonicalize_url(page_url)
+        with seen_lock:
+            if key in seen_pages or len(seen_pages) >= CRAWL_MAX_PAGES:
+                return
+            seen_pages.add(key)
+        page_queue.put((page_url, host))
+
+    def crawl_worker():
+        while True:
+            item = page_queue.get()
+            try:
+                if item is None:
+                    return
+                page_url, host = item
+                response = throttled_get(http_session, page_url, timeout=HTTP_TIMEOUT)
+                response.raise_for_status()
+                product_links, page_links = parse_listing_page(response.text, page_url)
+                with seen_lock:
+                    stats["pages"] += 1
+                logger.info(f"📄 {len(product_links)} product link(s) on {page_url}")
+                for link in product_links:
+                    key = canonicalize_url(link)
+                    with seen_lock:
+                        if key in seen_links:
+                            stats["duplicates"] += 1
+                            continue
+                        seen_links.add(key)
+                        stats["links"] += 1
+                    found_queue.put(link)
+                for next_page in page_links:
+                    if urlsplit(next_page).netloc.lower() == host:
+                        add_page(next_page, host)
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to crawl listing page {item[0]}: {e}")
+            finally:
+                page_queue.task_done()
+
+    def finish():
+        # Every queued page is done once the queue is joined, then the workers and the reader stop
+        page_queue.join()
+        for _ in workers:
+            page_queue.put(None)
+        found_queue.put(done)
+
+    for category_url in category_urls:
+        add_page(category_url, urlsplit(category_url).netloc.lower())
+    workers = [threading.Thread(target=crawl_worker, daemon=True) for _ in range(CRAWL_WORKERS)]
+    for worker in workers:
+        worker.start()
+    threading.Thread(target=finish, daemon=True).start()
+
+    while True:
+        link = found_queue.get()
+        if link is done:
+            break
+        yield link
+
+    summary = (f"🕸️ Crawled {stats['pages']} listing page(s): {stats['links']} product link(s), "
+               f"{stats['duplicates']} duplicate(s) dropped")
+    logger.info(summary)
+    print(summary)
+
+def iter_category_urls(sources):
+    # Each --crawl value is a category URL or a file of category URLs in any input format
+    for source in sources:
+        if source.startswith(("http://", "https://")) and not source.lower().endswith((".xml", ".xml.gz")):
+            yield source
+        else:
+            yield from iter_input_links(source)
+
+# Bounded work queue: the link reader blocks once LINK_QUEUE_SIZE links are waiting,
+# so only MAX_THREADS worker threads exist however long the link file is
+LINK_QUEUE_SIZE = MAX_THREADS * 2
+link_queue = queue.Queue(maxsize=LINK_QUEUE_SIZE)
+
+# Adaptive concurrency (AIMD): up to MAX_WORKERS threads are started but only concurrency_state["limit"]
+# of them scrape at a time. Every CONCURRENCY_INTERVAL seconds the controller adds one worker while pages
+# are healthy and work is waiting, and halves the limit when latency, errors, timeouts, free memory or
+# CPU load show strain. Each change is logged with its reason.
+MAX_WORKERS = MAX_THREADS  # Upper bound for the adaptive limit (override with --max-workers)
+MIN_WORKERS = 1
+CONCURRENCY_INTERVAL = 15  # Seconds between controller decisions
+MIN_WINDOW_PAGES = 3  # Pages a window needs before latency and error rates are trusted
+MAX_ERROR_RATE = 0.2
+MAX_TIMEOUT_RATE = 0.1
+MAX_LATENCY_FACTOR = 2.0  # Back off when page latency exceeds this multiple of the best window seen
+MIN_FREE_MEMORY_MB = 1024  # Back off below this, and only add a worker with one more Chrome's worth free
+CHROME_MEMORY_MB = 400
+MAX_LOAD_PER_CPU = 1.5
+concurrency_condition = threading.Condition()
+concurrency_state = {"limit": MAX_THREADS, "active": 0}
+concurrency_window = {"pages": 0, "errors": 0, "timeouts": 0, "seconds": 0.0}
+
+def acquire_worker_slot():
+    with concurrency_condition:
+        while concurrency_state["active"] >= concurrency_state["limit"]:
+            concurrency_condition.wait()
+        concurrency_state["active"] += 1
+
+def release_worker_slot():
+    with concurrency_condition:
+        concurrency_state["active"] -= 1
+        concurrency_condition.notify_all()
+
+def set_concurrency_limit(limit, reason):
+    with concurrency_condition:
+        previous = concurrency_state["limit"]
+        concurrency_state["limit"] = limit
+        concurrency_condition.notify_all()
+    if limit != previous:
+        arrow = "📈" if limit > previous else "📉"
+        logger.info(f"{arrow} Concurrency {previous} -> {limit}: {reason}")
+        print(f"{arrow} Concurrency {previous} -> {limit}: {reason}")
+
+def record_concurrency_sample(seconds, ok):
+    with concurrency_condition:
+        concurrency_window["pages"] += 1
+        concurrency_window["seconds"] += seconds
+        if not ok:
+            concurrency_window["errors"] += 1
+
+def record_concurrency_timeout():
+    with concurrency_condition:
+        concurrency_window["timeouts"] += 1
+
+def get_free_memory_mb():
+    if psutil:
+        return psutil.virtual_memory().available / 1024 / 1024
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None  # Unknown, memory is not used for decisions
+
+def get_load_per_cpu():
+    # 1-minute load average per core in both branches, so MAX_LOAD_PER_CPU means the same thing
+    if psutil:
+        return psutil.getloadavg()[0] / (psutil.cpu_count() or 1)
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
 
+def adjust_concurrency(best_latency):
+    """
+    One AIMD step over the pages finished since the last step. Returns the best average page
+    latency seen so far, the reference for the latency check.
+    """
+    with concurrency_condition:
+        window = dict(concurrency_window)
+        for key in concurrency_window:
+            concurrency_window[key] = 0
+        limit = concurrency_state["limit"]
+
+    free_memory = get_free_memory_mb()
+    load = get_load_per_cpu()
+    pages = window["pages"]
+    latency = window["seconds"] / pages if pages else None
+    if pages >= MIN_WINDOW_PAGES and (best_latency is None or latency < best_latency):
+        best_latency = latency
+
+    reason = None
+    if free_memory is not None and free_memory < MIN_FREE_MEMORY_MB:
+        reason = f"free memory {free_memory:.0f} MB below {MIN_FREE_MEMORY_MB} MB"
+    elif load is not None and load > MAX_LOAD_PER_CPU:
+        reason = f"CPU load {load:.2f} per core above {MAX_LOAD_PER_CPU}"
+    elif pages >= MIN_WINDOW_PAGES and window["timeouts"] / pages > MAX_TIMEOUT_RATE:
+        reason = f"{window['timeouts']} timeout(s) in {pages} pages"
+    elif pages >= MIN_WINDOW_PAGES and window["errors"] / pages > MAX_ERROR_RATE:
+        reason = f"{window['errors']} failed page(s) in {pages}"
+    elif pages >= MIN_WINDOW_PAGES and latency > best_latency * MAX_LATENCY_FACTOR:
+        reason = f"page latency {latency:.1f}s vs best {best_latency:.1f}s"
+    if reason:
+        set_concurrency_limit(max(MIN_WORKERS, limit // 2), reason)
+        return best_latency
+
+    if limit < MAX_WORKERS and pages and link_queue.qsize() > 0:
+        if free_memory is None or free_memory > MIN_FREE_MEMORY_MB + CHROME_MEMORY_MB:
+            set_concurrency_limit(limit + 1, f"{pages} healthy page(s) at {latency:.1f}s, work waiting")
+    return best_latency
+
+def concurrency_controller(stop_event):
+    best_latency = None
+    while not stop_event.wait(CONCURRENCY_INTERVAL):
+        try:
+            best_latency = adjust_concurrency(best_latency)
+        except Exception as e:
+            logger.warning(f"⚠️ Concurrency controller error: {e}")
 
-# Launch threads
-threads = []
-for link in df['Links']:
-    thread = threading.Thread(target=scrape_product_thread, args=(link,))
-    thread.start()
-    threads.append(thread)
+def link_worker():
+    page_worker.active = True
+    while True:
+        link = link_queue.get()
+        try:
+            if link is None:  # Sentinel: no more links
+                return
+            acquire_worker_slot()
+            try:
+                scrape_product_thread(link)
+            finally:
+                release_worker_slot()
+        except Exception as e:
+            logger.error(f"❌ Unexpected error in worker for {link}: {e}")
+            logger.error(traceback.format_exc())
+        finally:
+            link_queue.task_done()
 
-for t in threads:
-    t.join()
+def run_link_queue(links, worker_count=MAX_THREADS, max_workers=None):
+    """
+    Feeds the links to the worker threads. worker_count workers scrape at first; with a
+    max_workers above it the concurrency controller moves the limit between MIN_WORKERS
+    and max_workers.
+    """
+    max_workers = max(max_workers or worker_count, worker_count)
+    with concurrency_condition:
+        concurrency_state["limit"] = worker_count
+    if max_workers > worker_count:
+        logger.info(f"⚙️ Starting with {worker_count} worker(s), adaptive up to {max_workers}")
+    workers = [threading.Thread(target=link_worker, daemon=True) for _ in range(max_workers)]
+    for worker in workers:
+        worker.start()
+
+    stop_event = threading.Event()
+    if max_workers > worker_count:
+        threading.Thread(target=concurrency_controller, args=(stop_event,), daemon=True).start()
+
+    for link in links:
+        link_queue.put(link)  # Blocks while the queue is full (backpressure on the reader)
+
+    for _ in workers:
+        link_queue.put(None)
+    for worker in workers:
+        worker.join()
+    stop_event.set()
+
+# Sharding: each link is assigned to one of K shards by a hash of its URL, so shards never overlap
+# and the same link always lands in the same shard, whichever process or machine runs it
+def get_shard(link, shard_count):
+    digest = hashlib.sha1(canonicalize_url(link).encode("utf-8")).hexdigest()
+    return int(digest, 16) % shard_count
+
+def get_shard_output_filename(output_dir, shard_index, shard_count):
+    return os.path.join(output_dir, f"{OUTPUT_PREFIX}_shard-{shard_index:02d}-of-{shard_count:02d}.jsonl")
+
+def get_failed_filename(output_filename):
+    # Next to the records file under its own suffix, so a custom --output (even a .txt one) never collides
+    return os.path.splitext(output_filename)[0] + ".failed_links.txt"
+
+def configure_run(args):
+    # Applies the command line settings, also called inside each shard process
+    global DRIVER_POOL_SIZE, MAX_WORKERS, HOST_RATE, PROXIES, ENGINE, EXTRACTION_MODE, WAIT_TIMEOUT, BLOCK_MODE, BLOCK_BASELINE_PAGES, JOB_DB
+    global MANIFEST_TTL, CHANGE_DETECTION, MODE, OUTPUT_PREFIX, STAGES, RENDITIONS, JOB_BATCH_SIZE
+    if args.proxies and args.block == "allowlist" and args.engine != "http":
+        # The resolver rules would also apply to the proxy's host name, and behind a proxy the page hosts
+        # are resolved by the proxy, so the allowlist would break the proxy without blocking anything
+        raise SystemExit("--block allowlist cannot be used with --proxies in Chrome, use --block blocklist")
+    MAX_WORKERS = args.max_workers if args.max_workers is not None else max(args.workers, 2 * (os.cpu_count() or 1))
+    HOST_RATE = args.host_rate
+    PROXIES = load_proxies(args.proxies, allow_credentials=args.engine == "http") if args.proxies else []
+    DRIVER_POOL_SIZE = MAX_WORKERS  # Idle sessions above the current limit are closed as they are returned
+    ENGINE = args.engine
+    EXTRACTION_MODE = args.extraction
+    WAIT_TIMEOUT = args.wait_timeout
+    BLOCK_MODE = args.block
+    BLOCK_BASELINE_PAGES = args.block_baseline
+    MODE = args.mode
+    OUTPUT_PREFIX = "scraped_prices" if MODE == "price" else "scraped_product_data"
+    # Price runs keep their own job store, so their links never count as fully scraped
+    JOB_DB = args.job_db or os.path.join(args.output_dir, "price_jobs.db" if MODE == "price" else "scrape_jobs.db")
+    if args.ttl:
+        MANIFEST_TTL = parse_ttl(args.ttl)
+    STAGES = args.fields
+    if args.crawl:
+        JOB_BATCH_SIZE = CRAWL_BATCH_SIZE
+    RENDITIONS = [name.strip() for name in (args.renditions or "").split(",") if name.strip()]
+    unknown = set(RENDITIONS) - set(RENDITION_SPECS)
+    if unknown:
+        raise SystemExit(f"Unknown rendition(s) {sorted(unknown)}, choose from {sorted(RENDITION_SPECS)}")
+    if RENDITIONS and Image is None:
+        raise SystemExit("--renditions needs Pillow: pip install Pillow")
+    # Fingerprints and stored records are only comparable between runs that collect every field
+    CHANGE_DETECTION = not args.no_change_detection and MODE == "full" and STAGES == ALL_STAGES
+
+def run_shard(args, shard_index=None):
+    """
+    Scrapes every link of the input file that belongs to the given shard (all links when
+    shard_index is None) and saves the results. Returns the output filename.
+    """
+    configure_run(args)
+    start_rendition_pool()  # Before any thread of the run exists
+    shard_count = args.shards
+    output_dir = args.output_dir
+
+    os.makedirs(output_dir, exist_ok=True)
+    if args.output and shard_index is None:
+        output_filename = args.output  # Resumed runs can keep appending to the same file
+    elif shard_index is None:
+        current_time = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+        output_filename = os.path.join(output_dir, f"{OUTPUT_PREFIX}_{current_time}.jsonl")
+    else:
+        output_filename = get_shard_output_filename(output_dir, shard_index, shard_count)
+    failed_filename = get_failed_filename(output_filename)
+    # Shard files have fixed names: a new run starts them empty, so the merge never picks up records
+    # of an earlier run; --resume keeps appending to them
+    open_output_files(output_filename, failed_filename, append=shard_index is None or args.resume)
+    logger.info(f"📝 Writing records to {output_filename}")
+
+    open_job_db(JOB_DB)
+
+    if args.crawl:
+        links = crawl_categories(list(iter_category_urls(args.crawl)))
+    else:
+        links = iter_input_links(args.input)
+    if shard_index is not None:
+        links = (link for link in links if get_shard(link, shard_count) == shard_index)
+        logger.info(f"🧩 Running shard {shard_index + 1}/{shard_count} of {args.input}")
 
-# Save all data after all threads finish
-current_time = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-output_filename = f"scraped_product_data_{current_time}.xlsx"
+    try:
+        if not args.rescrape and MODE == "full":  # Prices are refreshed on every price run
+            links = skip_processed_links(links)
+        run_link_queue(iter_unfinished_links(links, args.resume), args.workers, MAX_WORKERS)
+    finally:
+        shutdown_driver_pool()
+        stop_image_downloader()
+        stop_rendition_pool()
+        close_output_files()
+        close_job_db()
+    log_timing_summary()
+    log_resource_summary()
+    log_change_summary()
+    log_image_summary()
+    log_retry_summary()
+    log_proxy_summary()
+    join_image_details(output_filename)
+
+    logger.info(f"✅ Data saved to {output_filename}")
+    print(f"✅ Data saved to {output_filename}")
+    if args.excel and shard_index is None:
+        export_to_excel(output_filename)
+    return output_filename
+
+def merge_shard_outputs(output_dir, shard_count, excel=False):
+    """
+    Combines the per-shard output files of a K-shard run into one result file, keeping the
+    last record of each link. Shards may come from different machines, they only need to be
+    copied into output_dir.
+    """
+    shard_files = sorted(glob.glob(os.path.join(output_dir, f"{OUTPUT_PREFIX}_shard-*-of-{shard_count:02d}.jsonl")))
+    if len(shard_files) < shard_count:
+        logger.warning(f"⚠️ Only {len(shard_files)} of {shard_count} shard outputs found in {output_dir}")
+        print(f"⚠️ Only {len(shard_files)} of {shard_count} shard outputs found in {output_dir}")
+    if not shard_files:
+        return None
 
-scraped_df = pd.DataFrame(scraped_data)
-scraped_df.to_excel(output_filename, index=False)
-logger.info(f"✅ Data saved to {output_filename}")
-print(f"✅ Data saved to {output_filename}")
\ No newline at end of file
+    # First pass finds the last line of every link, the second pass copies only those lines
+    last_seen = {}
+    for file_index, shard_file in enumerate(shard_files):
+        for line_index, record in enumerate(iter_jsonl_records(shard_file)):
+            last_seen[record.get("Link")] = (file_index, line_index)
+
+    current_time = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    output_filename = os.path.join(output_dir, f"{OUTPUT_PREFIX}_{current_time}.jsonl")
+    with open(output_filename, "w", encoding="utf-8") as out:
+        for file_index, shard_file in enumerate(shard_files):
+            for line_index, record in enumerate(iter_jsonl_records(shard_file)):
+                if last_seen[record.get("Link")] == (file_index, line_index):
+                    out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    logger.info(f"✅ Merged {len(shard_files)} shard(s) into {output_filename}")
+    print(f"✅ Merged {len(shard_files)} shard(s) into {output_filename}")
+    if excel:
+        export_to_excel(output_filename)
+    return output_filename
+
+def run_local_shards(args):
+    # One process per shard, each with its own worker threads and Chrome pool
+    processes = []
+    for shard_index in range(args.shards):
+        process = multiprocessing.Process(target=run_shard, args=(args, shard_index))
+        process.start()
+        processes.append(process)
+
+    for process in processes:
+        process.join()
+        if process.exitcode != 0:
+            logger.error(f"❌ Shard process {process.name} exited with code {process.exitcode}")
+
+    return merge_shard_outputs(args.output_dir, args.shards, args.excel)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape Box.co.uk product pages listed in an Excel file.")
+    parser.add_argument("--input", default=file_path,
+                        help="Links to scrape: Excel or CSV file with a 'Links' column, text file with one link per line, "
+                             "or a sitemap (.xml, .xml.gz or URL)")
+    parser.add_argument("--crawl", nargs="+", metavar="CATEGORY",
+                        help="Discover the product links from these category URLs (or files of category URLs) instead of --input")
+    parser.add_argument("--workers", type=int, default=MAX_THREADS,
+                        help="Worker threads (and Chrome sessions) per process to start with")
+    parser.add_argument("--max-workers", type=int,
+                        help="Upper bound for the adaptive concurrency (default: 2 per CPU core, at least --workers); "
+                             "equal to --workers keeps the concurrency fixed")
+    parser.add_argument("--output-dir", default=".", help="Folder for the output files")
+    parser.add_argument("--mode", choices=["full", "price"], default=MODE,
+                        help="full: every field and the images, price: only the prices and tags")
+    parser.add_argument("--update", metavar="JSONL",
+                        help="With --mode price, write the new prices into this earlier output file by MPN")
+    parser.add_argument("--fields", type=parse_stages, default=ALL_STAGES,
+                        help=f"Optional field groups to collect, comma separated from {', '.join(STAGE_FIELDS)} "
+                             "(default: all, 'none' for name, MPN and prices only)")
+    parser.add_argument("--proxies", help="Proxy URLs, comma separated or a file with one per line, "
+                                             "used by Chrome sessions, HTTP requests and image downloads")
+    parser.add_argument("--host-rate", type=float, default=HOST_RATE,
+                        help="Requests per second per host, shared by page loads, HTTP requests and image downloads")
+    parser.add_argument("--engine", choices=["auto", "http", "browser"], default=ENGINE,
+                        help="auto: HTTP extraction with Chrome fallback, http: no browser, browser: Chrome only")
+    parser.add_argument("--wait-timeout", type=float, default=WAIT_TIMEOUT,
+                        help="Upper bound in seconds for waits on page state (scrolling, accordions, popups)")
+    parser.add_argument("--block", choices=["blocklist", "allowlist", "off"], default=BLOCK_MODE,
+                        help="Block fonts, media, images and trackers (blocklist) or every host but the site (allowlist)")
+    parser.add_argument("--block-baseline", type=int, default=BLOCK_BASELINE_PAGES,
+                        help="Pages loaded without blocking first, to report bytes saved and load time change")
+    parser.add_argument("--extraction", choices=["snapshot", "webdriver"], default=EXTRACTION_MODE,
+                        help="How Chrome pages are read: one page snapshot, or element by element")
+    parser.add_argument("--shards", type=int, default=1, help="Split the input into K shards by URL hash")
+    parser.add_argument("--shard-index", type=int, default=None,
+                        help="Run only this shard (0-based), e.g. one shard per machine. Without it all shards run as local processes")
+    parser.add_argument("--merge", action="store_true", help="Only merge the per-shard outputs found in --output-dir")
+    parser.add_argument("--output", help="JSONL file to append the records to (default: a new timestamped file)")
+    parser.add_argument("--job-db", help="SQLite job store (default: scrape_jobs.db in --output-dir)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Only scrape links that are not finished in the job store, e.g. after a crash")
+    parser.add_argument("--ttl", help="How long processed links stay skipped per state, e.g. done=7d,invalid=30d,failed=0")
+    parser.add_argument("--rescrape", action="store_true", help="Ignore the manifest and scrape every input link")
+    parser.add_argument("--no-change-detection", action="store_true",
+                        help="Always re-scrape instead of carrying unchanged products forward")
+    parser.add_argument("--excel", action="store_true", help="Also export the final JSONL output to Excel")
+    parser.add_argument("--renditions", help=f"Image renditions to produce, comma separated from {', '.join(RENDITION_SPECS)}")
+    parser.add_argument("--prune-images", action="store_true",
+                        help="Only delete stored images that no image URL or file name refers to any more")
+    parser.add_argument("--export", metavar="JSONL", help="Only export an existing JSONL output file to Excel")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    configure_run(args)
+
+    output_filename = None
+    if args.export:
+        export_to_excel(args.export)
+    elif args.prune_images:
+        prune_image_store()
+    elif args.merge:
+        output_filename = merge_shard_outputs(args.output_dir, args.shards, args.excel)
+    elif args.shard_index is not None:
+        if not 0 <= args.shard_index < args.shards:
+            raise SystemExit(f"--shard-index must be between 0 and {args.shards - 1}")
+        run_shard(args, args.shard_index)
+    elif args.shards > 1:
+        output_filename = run_local_shards(args)
+    else:
+        output_filename = run_shard(args)
+
+    if MODE == "price" and args.update and output_filename:
+        update_prices(args.update, output_filename)
+
+
+if __name__ == "__main__":
+    main()
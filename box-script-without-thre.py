@@ -446,24 +446,45 @@ if os.path.exists(scraped_links_file):
 else:
     already_scraped_links = set()
 
-# Data list to store all scraped product data
 # Data list to store all scraped product data
 scraped_data = []
 failed_links = []
+failed_links_file = "failed_links.txt"
+open(failed_links_file, "w").close()  # Only this run's failures, appended as they happen
+
+# Every scraped record is appended here before its link goes into scraped_links.txt,
+# so links skipped by a later run always have their record on disk
+scraped_records_file = "scraped_records.jsonl"
+
+# Append one link as soon as it is processed, so an interrupted run keeps its progress
+def append_link(file_name, link):
+    with open(file_name, "a") as f:
+        f.write(link + "\n")
+
+def append_record(file_name, record):
+    with open(file_name, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
 
 # Progress bar with tqdm
 for link in tqdm(df['Links'], desc="🔍 Scraping product pages"):
+    if str(link).strip() in already_scraped_links:
+        print(f"⏭️ Already scraped, skipping: {link}")
+        continue
     print(f"🔄 Scraping: {link}")
     try:
         product_data = scrape_with_retries(link)
         if product_data:
             scraped_data.append(product_data)
+            append_record(scraped_records_file, product_data)
+            append_link(scraped_links_file, str(link).strip())
             logger.info(f"✅ Scraped successfully: {link}")
         else:
             failed_links.append(link)
+            append_link(failed_links_file, link)
             logger.warning(f"⚠️ Failed to scrape: {link}")
     except Exception as e:
         failed_links.append(link)
+        append_link(failed_links_file, link)
         logger.error(f"❌ Exception occurred on link: {link}")
         logger.error(traceback.format_exc())
 
@@ -472,19 +493,11 @@ current_time = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
 output_filename = f"scraped_product_data_{current_time}.xlsx"
 scraped_df = pd.DataFrame(scraped_data)
 scraped_df.to_excel(output_filename, index=False)
-logger.info(f"✅ Data saved to {output_filename}")
+logger.info(f"✅ Data saved to {output_filename} (records of earlier runs are in {scraped_records_file})")
 
-# ⚠️ Save failed links to a text file
+# ⚠️ Failed links were appended to a text file as they happened
 if failed_links:
-    with open('failed_links.txt', 'w') as f:
-        for link in failed_links:
-            f.write(link + '\n')
     print("⚠️ Failed links saved to 'failed_links.txt'")
     logger.warning(f"{len(failed_links)} links failed. See 'failed_links.txt'.")
 else:
-    print("✅ No failed links.")
-
-# Save successfully scraped links
-with open(scraped_links_file, "a") as f:
-    for item in scraped_data:
-        f.write(item['Link'] + "\n")
\ No newline at end of file
+    print("✅ No failed links.")
\ No newline at end of file
@@ -0,0 +1,49 @@
+import importlib.util
+import os
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+@pytest.fixture(scope="session")
+def scraper(tmp_path_factory):
+    # The script's file name is not importable, and importing it opens a log file in the working directory
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("logs"))
+    try:
+        spec = importlib.util.spec_from_file_location("box_scraper", os.path.join(ROOT, "box-scrap-without-proxy.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        os.chdir(cwd)
+    return module
+
+
+@pytest.fixture(autouse=True)
+def fresh_run_state(scraper, monkeypatch):
+    # Rate limits, retry budget and proxy health are per run, every test starts a new one
+    monkeypatch.setattr(scraper, "host_buckets", {})
+    monkeypatch.setattr(scraper, "retry_stats", {"attempts": 0, "retries": 0, "denied": 0})
+    monkeypatch.setattr(scraper, "proxy_stats", {})
+    monkeypatch.setattr(scraper, "PROXIES", [])
+    monkeypatch.setattr(scraper, "RETRY_BASE_DELAY", 0.01)
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="session")
+def fixture_server():
+    """Serves tests/fixtures on a local port, yields its base URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=FIXTURES))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
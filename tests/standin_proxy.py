@@ -0,0 +1,102 @@
+"""
+Stand-in forward proxy for trying the proxy pool locally: forwards plain HTTP GET requests and
+injects latency and failures. Used by the proxy pool tests, or run it on its own:
+
+    python tests/standin_proxy.py --port 8801 --delay 0.5 --failure-rate 0.3
+
+and pass --proxies http://127.0.0.1:8801 to the scraper (against http:// pages, e.g. the fixtures).
+"""
+import argparse
+import http.client
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+# Not forwarded in either direction; Date and Server are set by the proxy's own response
+SKIPPED_HEADERS = {"connection", "keep-alive", "proxy-connection", "proxy-authorization", "te", "trailer",
+                   "transfer-encoding", "upgrade", "content-length", "date", "server"}
+
+
+class StandInProxyHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        proxy = self.server
+        with proxy.lock:
+            proxy.requests += 1
+        time.sleep(proxy.delay)
+        if random.random() < proxy.failure_rate:
+            if proxy.failure_status is None:
+                self.close_connection = True  # Closed without a response, the client sees a dropped connection
+            else:
+                self.send_response(proxy.failure_status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            return
+
+        target = urlsplit(self.path)
+        upstream = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+        try:
+            headers = {key: value for key, value in self.headers.items() if key.lower() not in SKIPPED_HEADERS}
+            upstream.request("GET", (target.path or "/") + (f"?{target.query}" if target.query else ""), headers=headers)
+            response = upstream.getresponse()
+            body = response.read()
+        finally:
+            upstream.close()
+
+        self.send_response(response.status)
+        for key, value in response.getheaders():
+            if key.lower() not in SKIPPED_HEADERS:
+                self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInProxy(ThreadingHTTPServer):
+    """
+    Local proxy that waits delay seconds before every request and fails failure_rate of them,
+    with failure_status (e.g. 503 or 429) or, when failure_status is None, by dropping the connection.
+    """
+    daemon_threads = True
+
+    def __init__(self, port=0, delay=0.0, failure_rate=0.0, failure_status=503):
+        super().__init__(("127.0.0.1", port), StandInProxyHandler)
+        self.delay = delay
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in HTTP proxy that injects latency and failures.")
+    parser.add_argument("--port", type=int, default=8801)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of requests that fail, 0 to 1")
+    parser.add_argument("--failure-status", type=int, default=503,
+                        help="Status of the failed requests, 0 drops the connection instead")
+    args = parser.parse_args()
+
+    proxy = StandInProxy(args.port, args.delay, args.failure_rate, args.failure_status or None)
+    print(f"Stand-in proxy on {proxy.url}: {args.delay}s delay, {args.failure_rate:.0%} failures")
+    proxy.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
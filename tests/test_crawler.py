@@ -0,0 +1,62 @@
+def crawl(scraper, *category_urls):
+    return list(scraper.crawl_categories(list(category_urls)))
+
+
+def test_follows_pagination_and_drops_duplicates(scraper, fixture_server):
+    links = crawl(scraper, f"{fixture_server}/listing/laptops.html")
+
+    assert sorted(scraper.canonicalize_url(link) for link in links) == [
+        f"{fixture_server}/pdp/acer-swift-3.html",
+        f"{fixture_server}/pdp/dell-inspiron-15.html",
+        f"{fixture_server}/pdp/hp-14-no-discount.html",
+        f"{fixture_server}/pdp/lenovo-client-rendered.html",
+    ]
+
+
+def test_each_product_is_yielded_once_across_categories(scraper, fixture_server):
+    links = crawl(scraper, f"{fixture_server}/listing/laptops.html", f"{fixture_server}/listing/monitors.html")
+
+    keys = [scraper.canonicalize_url(link) for link in links]
+    assert len(keys) == len(set(keys)) == 5
+    assert f"{fixture_server}/pdp/samsung-odyssey-g5.html" in keys
+
+
+def test_pagination_stays_on_the_category_host(scraper, fixture_server, monkeypatch):
+    pages = []
+    parse_listing_page = scraper.parse_listing_page
+
+    def recording_parse(html, page_url):
+        pages.append(page_url)
+        return parse_listing_page(html, page_url)
+
+    monkeypatch.setattr(scraper, "parse_listing_page", recording_parse)
+    crawl(scraper, f"{fixture_server}/listing/laptops.html")
+
+    # Every page once, although each links to all of them, and the off-site page 9 is never fetched
+    assert sorted(pages) == [f"{fixture_server}/listing/laptops-page-2.html",
+                             f"{fixture_server}/listing/laptops-page-3.html",
+                             f"{fixture_server}/listing/laptops.html"]
+
+
+def test_page_limit(scraper, fixture_server, monkeypatch):
+    monkeypatch.setattr(scraper, "CRAWL_MAX_PAGES", 1)
+
+    links = crawl(scraper, f"{fixture_server}/listing/laptops.html")
+
+    assert len(links) == 2
+
+
+def test_failed_listing_page_does_not_stop_the_crawl(scraper, fixture_server):
+    links = crawl(scraper, f"{fixture_server}/listing/missing.html", f"{fixture_server}/listing/monitors.html")
+
+    assert len(links) == 2
+
+
+def test_parse_listing_page_returns_absolute_urls(scraper):
+    html = ('<div id="maincontent"><app-product-card><a href="/p/1">1</a></app-product-card></div>'
+            '<a rel="next" href="?page=2">Next</a>')
+
+    product_links, page_links = scraper.parse_listing_page(html, "https://www.box.co.uk/laptops")
+
+    assert product_links == ["https://www.box.co.uk/p/1"]
+    assert page_links == ["https://www.box.co.uk/laptops?page=2"]
@@ -0,0 +1,104 @@
+import json
+import os
+
+PDP_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "pdp")
+
+
+def fetch(scraper, fixture_server, name, **kwargs):
+    return scraper.scrape_product_http(f"{fixture_server}/pdp/{name}", **kwargs)
+
+
+def test_full_product_page(scraper, fixture_server):
+    record, image_urls, missing, validators = fetch(scraper, fixture_server, "acer-swift-3.html")
+
+    assert missing == []
+    assert validators["last_modified"]
+    assert record["Link"] == f"{fixture_server}/pdp/acer-swift-3.html"
+    assert record["Product Name"] == 'Acer Swift 3 SF314-43 14" Laptop'
+    assert record["Product MPN"] == "NX.AB1EK.004"
+    assert record["Product Current Price"] == "£549.99"
+    assert record["Product List Price"] == "£649.99"
+    assert (record["Sub Category"], record["Child Category"], record["Grand Child Categories"]) == \
+        ("Laptops", "Acer Laptops", ["Swift"])
+    assert image_urls == ["https://media.box.co.uk/images/nx-ab1ek-004-1.jpg",
+                          "https://media.box.co.uk/images/nx-ab1ek-004-2.jpg", None, None]
+    assert json.loads(record["Tags"]) == {"Tags": ["Clearance", "Free Delivery"]}
+    assert json.loads(record["Key_Features"]) == {"Key_Feature": ["AMD Ryzen 5 5500U processor", "8GB RAM, 512GB SSD"]}
+    assert json.loads(record["Specifications"]) == {
+        "MainHeader": "Specifications",
+        "Specs": [
+            {"Header": "General", "Attributes": [{"Key": "Processor", "Value": "AMD Ryzen 5 5500U"},
+                                                 {"Key": "Memory", "Value": "8GB"}]},
+            {"Header": "Display", "Attributes": [{"Key": "Screen Size", "Value": '14"'}]},
+        ],
+    }
+    assert record["FAQs"] == {"FAQs": [{"Question": "Does it come with Windows?",
+                                        "Answer": "Yes, Windows 11 Home is pre-installed."}]}
+    # Images are only set once download_record_images queues them
+    assert record["Stage_Status"] == {"breadcrumbs": "ok", "images": "empty", "tags": "ok",
+                                      "key_features": "ok", "specifications": "ok", "faqs": "ok"}
+
+
+def test_record_has_the_chrome_record_shape(scraper, fixture_server):
+    record, _, _, _ = fetch(scraper, fixture_server, "acer-swift-3.html")
+
+    assert list(record) == scraper.RECORD_FIELDS + [scraper.STAGE_STATUS_FIELD]
+
+
+def test_missing_sections_get_the_chrome_placeholders(scraper, fixture_server):
+    record, image_urls, missing, _ = fetch(scraper, fixture_server, "hp-14-no-discount.html")
+
+    assert missing == []
+    assert record["Product Current Price"] == "£329.00"
+    assert record["Product List Price"] == ""
+    assert json.loads(record["Key_Features"]) == {"Key_Feature": ["N/A"]}
+    assert json.loads(record["Tags"]) == {"Tags": ["N/A"]}
+    assert record["FAQs"] == {"FAQs": [{"Question": "N/A", "Answer": "No FAQs found"}]}
+    assert (record["Sub Category"], record["Child Category"], record["Grand Child Categories"]) == ("Laptops", None, [])
+    assert image_urls == ["https://media.box.co.uk/images/8a0h9ea-1.jpg", None, None, None]
+    assert record["Stage_Status"]["key_features"] == "empty"
+    assert record["Stage_Status"]["faqs"] == "empty"
+
+
+def test_client_rendered_page_falls_back_to_embedded_json(scraper, fixture_server):
+    record, _, missing, _ = fetch(scraper, fixture_server, "lenovo-client-rendered.html")
+
+    assert record["Product Name"] == "Lenovo IdeaPad 3 15ALC6"
+    assert record["Product MPN"] == "82KU00ABUK"
+    assert record["Product Current Price"] == "£449.00"
+    # Not in the server HTML, so the auto engine still opens the page in Chrome
+    assert missing == ["Specifications"]
+    assert json.loads(record["Specifications"]) == {"Specs": "No specifications found"}
+
+
+def test_unrequested_stages_are_not_collected(scraper, fixture_server):
+    record, image_urls, missing, _ = fetch(scraper, fixture_server, "acer-swift-3.html", stages=frozenset({"tags"}))
+
+    assert missing == []
+    assert image_urls == []
+    assert json.loads(record["Tags"]) == {"Tags": ["Clearance", "Free Delivery"]}
+    for stage, fields in scraper.STAGE_FIELDS.items():
+        if stage != "tags":
+            assert all(record[field] == scraper.NOT_COLLECTED for field in fields)
+    assert record["Stage_Status"] == {"tags": "ok"}
+
+
+def test_unchanged_page_is_not_modified(scraper, fixture_server):
+    _, _, _, validators = fetch(scraper, fixture_server, "acer-swift-3.html")
+    fingerprint = {"etag": validators["etag"], "last_modified": validators["last_modified"]}
+
+    record, _, _, _ = fetch(scraper, fixture_server, "acer-swift-3.html", fingerprint=fingerprint)
+
+    assert record == scraper.NOT_MODIFIED
+
+
+def test_missing_page_returns_no_record(scraper, fixture_server):
+    assert fetch(scraper, fixture_server, "does-not-exist.html") == (None, [], scraper.HTTP_REQUIRED_FIELDS, {})
+
+
+def test_extract_product_from_html_without_a_server(scraper):
+    with open(os.path.join(PDP_FIXTURES, "hp-14-no-discount.html"), encoding="utf-8") as f:
+        record, _, missing = scraper.extract_product_from_html(f.read(), "https://www.box.co.uk/8A0H9EA")
+
+    assert missing == []
+    assert record["Product MPN"] == "8A0H9EA"
@@ -0,0 +1,80 @@
+import json
+import os
+
+import pytest
+
+PDP_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "pdp")
+LINK = "https://www.box.co.uk/NX.AB1EK.004"
+FAQ_TAB = ('<a aria-expanded="true"><span class="p-accordion-header-text">Does it come with Windows?</span></a>\n'
+           '    <div role="region"><p>Yes, Windows 11 Home is pre-installed.</p></div>')
+
+
+class FakeDriver:
+    """Serves a saved product page whose FAQ panel only renders after ready_after accordion expansions."""
+
+    def __init__(self, scraper, ready_after):
+        with open(os.path.join(PDP_FIXTURES, "acer-swift-3.html"), encoding="utf-8") as f:
+            self.loaded_html = f.read()
+        assert FAQ_TAB in self.loaded_html
+        self.loading_html = self.loaded_html.replace(
+            FAQ_TAB, '<a aria-expanded="false"><span class="p-accordion-header-text">Does it come with Windows?</span></a>')
+        self.scraper = scraper
+        self.ready_after = ready_after
+        self.expansions = 0
+
+    @property
+    def ready(self):
+        return self.ready_after is not None and self.expansions >= self.ready_after
+
+    @property
+    def page_source(self):
+        return self.loaded_html if self.ready else self.loading_html
+
+    def execute_script(self, script, *args):
+        if script == self.scraper.EXPAND_ACCORDIONS_SCRIPT:
+            self.expansions += 1
+            return 1
+        if script == self.scraper.ACCORDION_PANELS_SCRIPT:
+            return self.ready
+        return 1  # Resource count of wait_for_network_idle, never changes
+
+    def find_element(self, by, value):
+        return object()  # The specification table is always there
+
+
+@pytest.fixture
+def snapshot(scraper, monkeypatch):
+    monkeypatch.setattr(scraper, "WAIT_TIMEOUT", 0.3)
+    monkeypatch.setattr(scraper, "download_record_images", lambda record, image_urls: None)
+
+    def scrape(ready_after, stages=frozenset({"specifications", "faqs"})):
+        driver = FakeDriver(scraper, ready_after)
+        return scraper.scrape_page_snapshot(driver, LINK, stages), driver
+
+    return scrape
+
+
+def test_faqs_that_render_in_time_are_not_retried(snapshot):
+    record, driver = snapshot(ready_after=1)
+
+    assert driver.expansions == 1
+    assert record["Stage_Status"] == {"specifications": "ok", "faqs": "ok"}
+    assert record["FAQs"]["FAQs"][0]["Question"] == "Does it come with Windows?"
+
+
+def test_late_faqs_are_retried_on_the_open_page(snapshot):
+    record, driver = snapshot(ready_after=2)
+
+    assert driver.expansions == 2
+    assert record["Stage_Status"] == {"specifications": "ok", "faqs": "ok"}
+    assert record["FAQs"]["FAQs"] == [{"Question": "Does it come with Windows?",
+                                       "Answer": "Yes, Windows 11 Home is pre-installed."}]
+    assert json.loads(record["Specifications"])["Specs"][0]["Header"] == "General"
+
+
+def test_faqs_that_never_render_get_the_fallback(snapshot, scraper):
+    record, driver = snapshot(ready_after=None, stages=frozenset({"faqs"}))
+
+    assert driver.expansions == scraper.STAGE_ATTEMPTS
+    assert record["Stage_Status"] == {"faqs": "timeout"}
+    assert record["FAQs"] == scraper.STAGE_FALLBACKS["faqs"]["FAQs"]
@@ -0,0 +1,160 @@
+import time
+
+import pytest
+
+from standin_proxy import StandInProxy
+
+PROXY_A = "http://proxy-a.test:8080"
+PROXY_B = "http://proxy-b.test:8080"
+
+
+@pytest.fixture
+def proxies(scraper, monkeypatch):
+    monkeypatch.setattr(scraper, "PROXIES", [PROXY_A, PROXY_B])
+    return scraper
+
+
+@pytest.fixture
+def standin_proxies():
+    started = []
+
+    def start(**kwargs):
+        proxy = StandInProxy(**kwargs).start()
+        started.append(proxy)
+        return proxy
+
+    yield start
+    for proxy in started:
+        proxy.stop()
+
+
+def test_no_proxies(scraper):
+    assert scraper.choose_proxy() is None
+    scraper.record_proxy_result(None, False, blocked=True)
+    assert scraper.proxy_stats == {}
+
+
+def test_consecutive_failures_eject_the_proxy(proxies):
+    for _ in range(proxies.PROXY_MAX_CONSECUTIVE_FAILURES - 1):
+        proxies.record_proxy_result(PROXY_A, False)
+    assert not proxies.is_proxy_cooling_down(PROXY_A)
+
+    proxies.record_proxy_result(PROXY_A, False)
+
+    assert proxies.is_proxy_cooling_down(PROXY_A)
+    assert {proxies.choose_proxy() for _ in range(50)} == {PROXY_B}
+
+
+def test_success_resets_the_failure_streak(proxies):
+    for _ in range(3):
+        proxies.record_proxy_result(PROXY_A, False)
+        proxies.record_proxy_result(PROXY_A, True, 0.1)
+        proxies.record_proxy_result(PROXY_A, True, 0.1)
+
+    assert not proxies.is_proxy_cooling_down(PROXY_A)
+
+
+def test_block_signal_ejects_at_once(proxies):
+    proxies.record_proxy_result(PROXY_A, False, blocked=True)
+
+    assert proxies.is_proxy_cooling_down(PROXY_A)
+    assert proxies.proxy_stats[PROXY_A]["blocks"] == 1
+
+
+def test_low_success_rate_ejects(proxies):
+    # Never 3 failures in a row, but the success rate falls below PROXY_MIN_SUCCESS on the 5th sample
+    for ok in (False, False, True, False):
+        proxies.record_proxy_result(PROXY_A, ok, 0.1)
+    assert not proxies.is_proxy_cooling_down(PROXY_A)
+
+    proxies.record_proxy_result(PROXY_A, False, 0.1)
+
+    assert proxies.proxy_stats[PROXY_A]["success"] < proxies.PROXY_MIN_SUCCESS
+    assert proxies.is_proxy_cooling_down(PROXY_A)
+
+
+def test_cooldown_doubles_and_the_proxy_returns_on_probation(proxies):
+    proxies.record_proxy_result(PROXY_A, False, blocked=True)
+    state = proxies.proxy_stats[PROXY_A]
+    assert state["cooldown_until"] - time.time() == pytest.approx(proxies.PROXY_COOLDOWN, abs=5)
+
+    state["cooldown_until"] = time.time() - 1  # Cool-down over
+    proxies.choose_proxy()
+
+    assert not proxies.is_proxy_cooling_down(PROXY_A)
+    assert (state["success"], state["samples"], state["consecutive_failures"]) == (0.75, 0, 0)
+
+    proxies.record_proxy_result(PROXY_A, False, blocked=True)
+    assert state["cooldown_until"] - time.time() == pytest.approx(2 * proxies.PROXY_COOLDOWN, abs=5)
+
+
+def test_cooldown_is_capped(proxies):
+    state = proxies.get_proxy_state(PROXY_A)
+    state["ejections"] = 10
+
+    proxies.record_proxy_result(PROXY_A, False, blocked=True)
+
+    assert state["cooldown_until"] - time.time() == pytest.approx(proxies.PROXY_MAX_COOLDOWN, abs=5)
+
+
+def test_all_proxies_cooling_down_uses_the_first_one_back(proxies):
+    proxies.record_proxy_result(PROXY_A, False, blocked=True)
+    proxies.record_proxy_result(PROXY_B, False, blocked=True)
+    proxies.proxy_stats[PROXY_B]["cooldown_until"] = time.time() + 10
+
+    assert proxies.choose_proxy() == PROXY_B
+
+
+def test_score_prefers_fast_reliable_proxies(proxies):
+    proxies.record_proxy_result(PROXY_A, True, 0.2)
+    proxies.record_proxy_result(PROXY_B, True, 20.0)
+
+    assert proxies.get_proxy_score(proxies.proxy_stats[PROXY_A]) > 2 * proxies.get_proxy_score(proxies.proxy_stats[PROXY_B])
+
+
+def fetch_through_pool(scraper, fixture_server, count):
+    responses = [scraper.throttled_get(scraper.http_session, f"{fixture_server}/pdp/acer-swift-3.html", timeout=10)
+                 for _ in range(count)]
+    return [response.status_code for response in responses]
+
+
+@pytest.mark.parametrize("failure_status", [503, 429, None])
+def test_failing_standin_proxy_is_ejected(scraper, fixture_server, standin_proxies, monkeypatch, failure_status):
+    failing = standin_proxies(failure_rate=1.0, failure_status=failure_status)
+    healthy = standin_proxies()
+    monkeypatch.setattr(scraper, "PROXIES", [failing.url, healthy.url])
+    monkeypatch.setattr(scraper, "HOST_RATE", 100.0)
+    monkeypatch.setattr(scraper, "HOST_BURST", 100)
+    # Enough attempts to outlast the failing proxy even if every pick lands on it until it is ejected
+    monkeypatch.setattr(scraper, "HTTP_RETRIES", scraper.PROXY_MAX_CONSECUTIVE_FAILURES + 1)
+
+    statuses = fetch_through_pool(scraper, fixture_server, 20)
+
+    # Failed attempts went out again through the healthy proxy
+    assert statuses == [200] * 20
+    assert scraper.is_proxy_cooling_down(failing.url)
+    assert not scraper.is_proxy_cooling_down(healthy.url)
+    assert healthy.requests >= 20
+    # Errors the proxy returned itself do not slow the site down
+    host = scraper.urlsplit(fixture_server).netloc
+    assert scraper.host_buckets[host]["rate"] == scraper.HOST_RATE
+
+
+def test_standin_proxy_latency_lowers_the_score(scraper, fixture_server, standin_proxies, monkeypatch):
+    slow = standin_proxies(delay=0.3)
+    fast = standin_proxies()
+    for proxy in (slow, fast):
+        monkeypatch.setattr(scraper, "PROXIES", [proxy.url])
+        assert fetch_through_pool(scraper, fixture_server, 3) == [200] * 3
+
+    slow_state, fast_state = scraper.proxy_stats[slow.url], scraper.proxy_stats[fast.url]
+    assert slow_state["latency"] >= 0.3 > fast_state["latency"]
+    assert scraper.get_proxy_score(slow_state) < scraper.get_proxy_score(fast_state)
+
+
+@pytest.mark.parametrize("engine", ["browser", "auto"])
+def test_allowlist_blocking_is_rejected_with_proxies(scraper, monkeypatch, engine):
+    monkeypatch.setattr("sys.argv", ["scraper", "--proxies", PROXY_A, "--block", "allowlist", "--engine", engine])
+
+    with pytest.raises(SystemExit, match="--block allowlist cannot be used with --proxies"):
+        scraper.configure_run(scraper.parse_args())
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+
+def network_event(method, **params):
+    return {"level": "INFO", "message": json.dumps({"message": {"method": method, "params": params}, "webview": "1"})}
+
+
+class FakeDriver:
+    """Chrome session whose performance log holds the given CDP events until it is read."""
+
+    def __init__(self, *events, load_ms=800.0):
+        self.log = list(events)
+        self.load_ms = load_ms
+
+    def get_log(self, log_type):
+        assert log_type == "performance"
+        entries, self.log = self.log, []
+        return entries
+
+    def execute_script(self, script, *args):
+        return self.load_ms
+
+
+@pytest.fixture
+def resource_stats(scraper, monkeypatch):
+    stats = {"baseline": {"pages": 0, "bytes": 0, "load_ms": 0.0}, "blocked": {"pages": 0, "bytes": 0, "load_ms": 0.0}}
+    monkeypatch.setattr(scraper, "resource_stats", stats)
+    return stats
+
+
+def test_cross_origin_responses_are_counted(scraper):
+    driver = FakeDriver(
+        network_event("Network.requestWillBeSent", requestId="1"),
+        network_event("Network.loadingFinished", requestId="1", encodedDataLength=50_000),  # The page
+        network_event("Network.loadingFinished", requestId="2", encodedDataLength=120_000),  # A third-party script
+        network_event("Network.loadingFailed", requestId="3", blockedReason="inspector"),  # Blocked, costs nothing
+    )
+
+    assert scraper.read_transferred_bytes(driver) == 170_000
+    assert scraper.read_transferred_bytes(driver) == 0  # The log was drained
+
+
+def test_blocked_page_reports_savings_against_the_baseline(scraper, resource_stats):
+    baseline = FakeDriver(network_event("Network.loadingFinished", encodedDataLength=400_000), load_ms=2000.0)
+    blocked = FakeDriver(network_event("Network.loadingFinished", encodedDataLength=100_000), load_ms=900.0)
+
+    scraper.record_page_resources(baseline, False, "https://www.box.co.uk/a")
+    scraper.record_page_resources(blocked, True, "https://www.box.co.uk/b")
+
+    assert resource_stats["baseline"] == {"pages": 1, "bytes": 400_000, "load_ms": 2000.0}
+    assert resource_stats["blocked"] == {"pages": 1, "bytes": 100_000, "load_ms": 900.0}
+
+
+def test_start_page_resources_drops_earlier_pages(scraper, resource_stats):
+    driver = FakeDriver(network_event("Network.loadingFinished", encodedDataLength=999_999))
+
+    scraper.start_page_resources(driver)
+    driver.log.append(network_event("Network.loadingFinished", encodedDataLength=1_000))
+    scraper.record_page_resources(driver, True, "https://www.box.co.uk/a")
+
+    assert resource_stats["blocked"]["bytes"] == 1_000